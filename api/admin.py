@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import Candidate, DesignReview, DesignDocument, ProbingQuestions, DesignReviewScore
+from .models import Candidate, DesignReview, DocumentBlob, DocumentPage, DesignDocument, ProbingQuestions, DesignReviewScore, LLMCall
 
 admin.site.register(Candidate)
 admin.site.register(DesignReview)
+admin.site.register(DocumentBlob)
+admin.site.register(DocumentPage)
 admin.site.register(DesignDocument)
 admin.site.register(ProbingQuestions)
 admin.site.register(DesignReviewScore)
+admin.site.register(LLMCall)
@@ -0,0 +1,169 @@
+"""
+Async execution of LLM calls.
+
+With ``LLM_EXECUTION = 'async'`` the tasks hand their backend calls to one
+event loop per worker process, running in a background thread, instead of
+blocking a whole process in the SDK's sync client. Run the worker with a
+thread pool (``--pool threads --concurrency N``) so many reviews are in
+flight in one process; at most ``LLM_ASYNC_CONCURRENCY`` calls run at once
+and the rest wait on the semaphore.
+
+Hedged requests (``LLM_HEDGE_ENABLED``) also run here, in either mode: a call
+still unanswered after the recent p95 latency of its purpose gets a second,
+identical request, and whichever answers first wins. Only the slowest few
+percent of calls are sent twice.
+"""
+import asyncio
+import dataclasses
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+_runner = None
+_runner_pid = None
+_lock = threading.Lock()
+
+
+class Runner:
+    """
+    An event loop in a daemon thread, with a semaphore bounding the calls
+    running on it.
+    """
+
+    def __init__(self, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.thread = threading.Thread(target=self.loop.run_forever, name='llm-async-loop', daemon=True)
+        self.thread.start()
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        await self.semaphore.acquire()
+        metrics.observe('llm.async.queue_wait', time.perf_counter() - start)
+
+    async def _limited(self, coro):
+        await self._acquire()
+        try:
+            return await coro
+        finally:
+            self.semaphore.release()
+
+    def run(self, coro):
+        """
+        Run a coroutine on the loop and return its result, blocking the
+        calling thread until it is done.
+        """
+        return asyncio.run_coroutine_threadsafe(self._limited(coro), self.loop).result()
+
+    def iterate(self, iterator):
+        """
+        Yield the items of an async iterator consumed on the loop, as they
+        arrive. The iterator holds one semaphore slot until it is exhausted
+        or the caller stops early.
+        """
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            await self._acquire()
+            try:
+                async for item in iterator:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((done, e))
+                raise
+            else:
+                items.put((done, None))
+            finally:
+                self.semaphore.release()
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                item, error = items.get()
+                if error is not None:
+                    raise error
+                if item is done:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+def get_runner():
+    """
+    Return this process's runner, starting it on first use. A runner
+    inherited across fork has no loop thread and is replaced.
+    """
+    global _runner, _runner_pid
+    pid = os.getpid()
+    if _runner is None or _runner_pid != pid:
+        with _lock:
+            if _runner is None or _runner_pid != pid:
+                _runner = Runner(settings.LLM_ASYNC_CONCURRENCY)
+                _runner_pid = pid
+    return _runner
+
+
+def reset_runner():
+    global _runner, _runner_pid
+    with _lock:
+        if _runner is not None and _runner_pid == os.getpid():
+            _runner.close()
+        _runner = None
+        _runner_pid = None
+
+
+def enabled():
+    return settings.LLM_EXECUTION == 'async'
+
+
+def hedge_delay(purpose):
+    """
+    Seconds after which a call of this purpose is hedged, or None when
+    hedging is off or too few calls have been timed yet.
+    """
+    name = f'llm.{purpose}.latency'
+    if not settings.LLM_HEDGE_ENABLED or metrics.count(name) < settings.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return metrics.percentile(name, settings.LLM_HEDGE_PERCENTILE)
+
+
+async def hedged(backend, request, delay, may_hedge):
+    """
+    Run ``backend.agenerate(request)``; if it has not answered after
+    ``delay`` seconds and ``may_hedge()`` allows it, send the request again
+    and return the first successful response, cancelling the other. The
+    hedge runs outside the runner's semaphore.
+    """
+    first = asyncio.ensure_future(backend.agenerate(request))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done or not await asyncio.to_thread(may_hedge):
+        return await first
+    metrics.incr(f'llm.{request.purpose}.hedged')
+    second = asyncio.ensure_future(backend.agenerate(dataclasses.replace(request)))
+    pending = {first, second}
+    try:
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [call for call in done if call.exception() is None]
+            if succeeded:
+                if first not in succeeded:
+                    metrics.incr(f'llm.{request.purpose}.hedge_won')
+                    return second.result()
+                return first.result()
+            if not pending:
+                # Both failed: report the original request's error
+                return first.result()
+    finally:
+        for call in pending:
+            call.cancel()
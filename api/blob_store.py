@@ -0,0 +1,215 @@
+"""
+Content-addressed storage for uploaded design documents.
+
+Files are hashed while they are streamed to disk and stored once under
+``design_documents/<aa>/<digest><ext>``. Identical uploads share a single
+DocumentBlob row whose refCount follows the DesignDocument rows pointing at it.
+The digest is the stable key for anything derived from a document's content.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DocumentBlob
+
+BLOB_DIR = 'design_documents'
+HASH_ALGORITHM = 'sha256'
+
+
+def blob_relative_path(digest, ext=''):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{ext.lower()}'
+
+
+def blob_root():
+    return os.path.join(settings.MEDIA_ROOT, BLOB_DIR)
+
+
+def hash_file(path, chunk_size=64 * 1024):
+    """
+    Return the content digest of a file already on disk.
+    """
+    h = hashlib.new(HASH_ALGORITHM)
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _hash_upload(uploaded_file):
+    """
+    Hash an upload Django has already buffered (in memory or in its own
+    temporary file) without writing anything. Returns (digest, size).
+    """
+    h = hashlib.new(HASH_ALGORITHM)
+    size = 0
+    for chunk in uploaded_file.chunks():
+        h.update(chunk)
+        size += len(chunk)
+    uploaded_file.seek(0)
+    return h.hexdigest(), size
+
+
+def _spool(uploaded_file):
+    """
+    Stream an uploaded file to a temporary file next to the blob store,
+    hashing it on the way. Returns (digest, size, temp_path).
+    """
+    root = blob_root()
+    os.makedirs(root, exist_ok=True)
+    h = hashlib.new(HASH_ALGORITHM)
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=root, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            for chunk in uploaded_file.chunks():
+                h.update(chunk)
+                size += len(chunk)
+                destination.write(chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return h.hexdigest(), size, temp_path
+
+
+def _acquire_existing(digest):
+    """
+    Add a reference to an existing blob. Returns the blob or None.
+    """
+    if DocumentBlob.objects.filter(digest=digest).update(refCount=F('refCount') + 1):
+        return DocumentBlob.objects.get(digest=digest)
+    return None
+
+
+def prepare_upload(uploaded_file):
+    """
+    The slow part of storing an upload, done before a database transaction
+    is opened so the write lock is not held during file I/O: hash it and,
+    for content not stored yet, write it to a temporary file. Returns
+    (digest, size, temp_path); temp_path is None for known content.
+
+    Uploads received by upload_handlers.BlobUploadHandler are already hashed
+    and spooled, so they are used as they are.
+    """
+    if getattr(uploaded_file, 'digest', None):
+        return uploaded_file.digest, uploaded_file.size, uploaded_file.temporary_file_path()
+    digest, size = _hash_upload(uploaded_file)
+    if DocumentBlob.objects.filter(digest=digest).exists():
+        return digest, size, None
+    return _spool(uploaded_file)
+
+
+def store_prepared(uploaded_file, prepared):
+    """
+    Second half of prepare_upload, run inside the transaction: take the
+    reference and return the DocumentBlob.
+    """
+    digest, size, temp_path = prepared
+    if temp_path is None:
+        blob = _acquire_existing(digest)
+        if blob is not None:
+            return blob
+        # The last reference was released after prepare_upload looked
+        digest, size, temp_path = _spool(uploaded_file)
+    # Only content types sniffed by the upload handler are trusted
+    sniffed = getattr(uploaded_file, 'digest', None) is not None
+    return store_spooled(
+        digest, size, temp_path, os.path.splitext(uploaded_file.name)[1],
+        mime_type=uploaded_file.content_type if sniffed else None,
+        page_count=getattr(uploaded_file, 'page_count', None),
+    )
+
+
+def discard_prepared(prepared_uploads):
+    """
+    Remove temporary files of prepared uploads that were never stored.
+    """
+    for _, _, temp_path in prepared_uploads:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def store_spooled(digest, size, temp_path, ext='', mime_type=None, page_count=None):
+    """
+    Move an already hashed temporary file into the store (or drop it if the
+    digest is known) and return the referenced DocumentBlob.
+    """
+    blob = _acquire_existing(digest)
+    if blob is not None:
+        os.unlink(temp_path)
+        return blob
+
+    relative_path = blob_relative_path(digest, ext)
+    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    try:
+        os.replace(temp_path, full_path)
+    except FileNotFoundError:
+        # First blob under this digest prefix
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(temp_path, full_path)
+    try:
+        with transaction.atomic():
+            return DocumentBlob.objects.create(
+                digest=digest, path=relative_path, size=size, refCount=1,
+                mimeType=mime_type, pageCount=page_count,
+            )
+    except IntegrityError:
+        # A concurrent upload of the same content won the insert; the file it
+        # wrote has the same bytes, so only the reference needs taking.
+        return _acquire_existing(digest)
+
+
+def release(digest):
+    """
+    Drop one reference to a blob, deleting the row and file with the last one.
+    """
+    with transaction.atomic():
+        DocumentBlob.objects.filter(digest=digest, refCount__gt=0).update(refCount=F('refCount') - 1)
+        blob = DocumentBlob.objects.select_for_update().filter(digest=digest, refCount=0).first()
+        if blob is None:
+            return
+        if blob.documents.exists():
+            return
+        full_path = os.path.join(settings.MEDIA_ROOT, blob.path)
+        blob.delete()
+        transaction.on_commit(lambda: _remove_file(digest, full_path))
+
+
+def _remove_file(digest, full_path):
+    # The same content may have been uploaded again after the row was deleted
+    # and before this commit hook ran; its file is at the same path.
+    if DocumentBlob.objects.filter(digest=digest).exists():
+        return
+    try:
+        os.remove(full_path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_orphans(digests):
+    """
+    Remove files written for digests whose DocumentBlob row does not exist,
+    e.g. after the transaction that created them was rolled back.
+    """
+    for digest in digests:
+        if DocumentBlob.objects.filter(digest=digest).exists():
+            continue
+        directory = os.path.join(blob_root(), digest[:2])
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.startswith(digest):
+                _remove_file(digest, os.path.join(directory, name))
+
+
+def document_digest(document):
+    """
+    Content digest for a DesignDocument. Documents stored before the blob
+    store existed are hashed from disk.
+    """
+    if document.blob_id:
+        return document.blob_id
+    return hash_file(os.path.join(settings.MEDIA_ROOT, document.path))
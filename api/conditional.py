@@ -0,0 +1,68 @@
+"""
+Conditional GET for design review reads.
+
+A review's representation changes only when the review, its candidate or
+one of its documents, questions or scores changes, and every such write
+bumps ``updatedOn``. One query gathers the latest ``updatedOn`` and the row
+count (which catches deletions) of each; they hash to a strong ETag and give
+Last-Modified, so a revalidating client gets 304 before anything is
+serialized.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import DesignDocument, DesignReview, DesignReviewScore, ProbingQuestions
+
+RELATED = {
+    'documents': DesignDocument,
+    'questions': ProbingQuestions,
+    'scores': DesignReviewScore,
+}
+
+
+def _per_review(model, aggregate):
+    rows = model.objects.filter(designReview=OuterRef('pk')).order_by().values('designReview')
+    return Subquery(rows.annotate(value=aggregate).values('value'))
+
+
+async def review_validators(design_review_id, variant=''):
+    """
+    Return (etag, last_modified) for the review, or None if it does not
+    exist. ``variant`` distinguishes representations of the same review,
+    e.g. different endpoints or query parameters.
+    """
+    annotations = {}
+    for name, model in RELATED.items():
+        annotations[f'{name}_latest'] = _per_review(model, Max('updatedOn'))
+        annotations[f'{name}_count'] = _per_review(model, Count('id'))
+    row = await DesignReview.objects.filter(pk=design_review_id).annotate(**annotations).values(
+        'updatedOn', 'candidate__updatedOn', *annotations).afirst()
+    if row is None:
+        return None
+    parts = [variant] + [f'{key}={row[key]}' for key in sorted(row)]
+    etag = '"%s"' % hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+    timestamps = [row['updatedOn'], row['candidate__updatedOn']] + [row[f'{name}_latest'] for name in RELATED]
+    last_modified = max(t for t in timestamps if t is not None)
+    return etag, int(last_modified.timestamp())
+
+
+def not_modified(request, validators):
+    """
+    The 304 (or 412) response for a request whose preconditions the
+    validators satisfy, else None.
+    """
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return None if response is None else set_validators(response, validators)
+
+
+def set_validators(response, validators):
+    etag, last_modified = validators
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Caches may keep the response but must revalidate before reusing it
+    patch_cache_control(response, no_cache=True)
+    return response
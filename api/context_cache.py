@@ -0,0 +1,88 @@
+"""
+Shared LLM context for a set of design documents.
+
+Question generation, evaluation and re-evaluation of a review all send the
+same documents. The backend's cached-content handle for those documents is
+created once, keyed by (backend, model, prompt version, document digests),
+and kept in Django's cache so every process can reuse it until it expires.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds to keep a handle in our registry less than the backend keeps it,
+# so we never hand out a handle that expires mid-request.
+EXPIRY_MARGIN = 60
+# Remember failed creations (e.g. content below the backend's minimum cache
+# size) for this long instead of retrying on every call.
+NEGATIVE_TTL = 600
+UNAVAILABLE = 'unavailable'
+
+
+def context_key(backend, model, prompt_version, documents):
+    digests = sorted(document.digest for document in documents)
+    raw = '\x1f'.join([backend.name, model, prompt_version] + digests)
+    return 'llm-context:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_or_create(backend, model, prompt_version, documents, before_create=None):
+    """
+    Return a cached-context handle for the documents, creating it on first
+    use. Returns None when the backend cannot cache this content, in which
+    case the caller sends the documents inline.
+
+    ``before_create`` is called with the documents right before the backend
+    uploads them, e.g. to draw rate-limit capacity; what it raises is raised
+    to the caller and the context is left for a later call to create.
+    """
+    if not documents or not settings.LLM_CONTEXT_CACHE_ENABLED:
+        return None
+    key = context_key(backend, model, prompt_version, documents)
+    handle = cache.get(key)
+    if handle == UNAVAILABLE:
+        return None
+    if handle is not None:
+        metrics.incr('llm.context_cache.hit')
+        return handle
+
+    # Only one process creates the context; the others wait briefly for it.
+    lock_key = key + ':lock'
+    if not cache.add(lock_key, 1, timeout=60):
+        deadline = time.monotonic() + settings.LLM_CONTEXT_CACHE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            handle = cache.get(key)
+            if handle is not None:
+                metrics.incr('llm.context_cache.hit')
+                return None if handle == UNAVAILABLE else handle
+        metrics.incr('llm.context_cache.wait_timeout')
+        return None
+
+    metrics.incr('llm.context_cache.miss')
+    if before_create is not None:
+        try:
+            before_create(documents)
+        except Exception:
+            cache.delete(lock_key)
+            raise
+    ttl = settings.LLM_CONTEXT_CACHE_TTL
+    try:
+        with metrics.timer('llm.context_cache.create'):
+            handle = backend.create_context(model, documents, ttl)
+    except Exception:
+        logger.exception('Could not create LLM context %s; sending documents inline', key)
+        handle = None
+
+    if handle is None:
+        cache.set(key, UNAVAILABLE, NEGATIVE_TTL)
+    else:
+        cache.set(key, handle, max(ttl - EXPIRY_MARGIN, 1))
+    cache.delete(lock_key)
+    return handle
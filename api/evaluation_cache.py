@@ -0,0 +1,126 @@
+"""
+Read-through cache of rendered evaluation payloads.
+
+Payloads live in the shared cache under a per-review version number.
+Invalidating a review bumps its version, so a payload rendered from data
+that was read before the change can only land under the old version and is
+never served. On a miss only one request renders the payload while
+concurrent requests for the same review wait briefly for its result.
+
+Cache errors are logged and treated as misses, so a Redis outage slows the
+endpoint down but does not fail it.
+"""
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds the render lock lives if its holder dies before releasing it
+LOCK_TIMEOUT = 10
+
+
+def _version_key(design_review_id):
+    return f'evaluation:{design_review_id}:version'
+
+
+def _payload_key(design_review_id, version):
+    return f'evaluation:{design_review_id}:v{version}'
+
+
+async def _version(design_review_id):
+    key = _version_key(design_review_id)
+    version = await cache.aget(key)
+    if version is None:
+        # Start from a fresh number so a version key lost to eviction can
+        # never make an older payload current again.
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def get_or_render(design_review_id, render):
+    """
+    Return the cached payload for the review, or await ``render()`` to
+    build it and cache the result.
+    """
+    try:
+        key = _payload_key(design_review_id, await _version(design_review_id))
+        payload = await cache.aget(key)
+        lock_key = key + ':lock'
+        locked = payload is None and await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT)
+    except Exception:
+        logger.warning('Evaluation cache lookup failed for design review %s', design_review_id, exc_info=True)
+        metrics.incr('cache.evaluation.errors')
+        return await render()
+
+    if payload is not None:
+        metrics.incr('cache.evaluation.hit')
+        return payload
+    metrics.incr('cache.evaluation.miss')
+
+    if not locked:
+        # Another request is rendering this payload; wait for its result
+        deadline = time.monotonic() + settings.EVALUATION_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            try:
+                payload = await cache.aget(key)
+            except Exception:
+                break
+            if payload is not None:
+                metrics.incr('cache.evaluation.lock_wait_hit')
+                return payload
+        metrics.incr('cache.evaluation.lock_timeout')
+        return await render()
+
+    try:
+        payload = await render()
+    except BaseException:
+        await _release(lock_key)
+        raise
+    try:
+        await cache.aset(key, payload, settings.EVALUATION_CACHE_TTL)
+    except Exception:
+        logger.warning('Could not cache evaluation of design review %s', design_review_id, exc_info=True)
+        metrics.incr('cache.evaluation.errors')
+    await _release(lock_key)
+    return payload
+
+
+async def _release(lock_key):
+    try:
+        await cache.adelete(lock_key)
+    except Exception:
+        logger.warning('Could not release evaluation cache lock %s', lock_key, exc_info=True)
+
+
+def invalidate(design_review_id):
+    try:
+        cache.incr(_version_key(design_review_id))
+    except ValueError:
+        # No version yet, so nothing is cached for this review
+        pass
+    except Exception:
+        logger.warning('Evaluation cache invalidation failed for design review %s', design_review_id, exc_info=True)
+        metrics.incr('cache.evaluation.errors')
+        return
+    metrics.incr('cache.evaluation.invalidations')
+
+
+def invalidate_after_write(*design_review_ids):
+    """
+    For use next to a write: invalidate now and again once the write
+    commits, since a reader may re-cache the old rows before the commit.
+    """
+    def invalidate_all():
+        for design_review_id in design_review_ids:
+            invalidate(design_review_id)
+    invalidate_all()
+    transaction.on_commit(invalidate_all)
@@ -0,0 +1,103 @@
+"""
+Design review progress events.
+
+Tasks and views publish status transitions, new questions and the final
+score to a Redis pub/sub channel per design review. The SSE endpoint in
+``api.views`` subscribes to that channel and forwards events to the browser,
+so clients no longer have to poll.
+"""
+import json
+import logging
+import threading
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+# After a failed publish, skip publishing for a while instead of paying a
+# connection attempt (and a log line) for every event during an outage.
+RETRY_AFTER = 30
+_paused_until = 0.0
+
+
+def channel_name(design_review_id):
+    return f'design-review:{design_review_id}:events'
+
+
+def _redis():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(settings.EVENTS_REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return _client
+
+
+def async_redis():
+    """
+    New asyncio Redis client for one subscriber; the caller closes it.
+    """
+    return redis.asyncio.Redis.from_url(settings.EVENTS_REDIS_URL)
+
+
+def encode(event, data):
+    return json.dumps({'event': event, 'data': data}, cls=JSONEncoder)
+
+
+def publish(design_review_id, event, data):
+    """
+    Publish an event for a design review. Delivery is best effort: a Redis
+    outage must never fail the task or request that produced the event.
+    """
+    global _paused_until
+    if time.monotonic() < _paused_until:
+        metrics.incr('events.skipped')
+        return
+    try:
+        _redis().publish(channel_name(design_review_id), encode(event, data))
+        metrics.incr('events.published')
+    except Exception as e:
+        metrics.incr('events.publish_failed')
+        _paused_until = time.monotonic() + RETRY_AFTER
+        logger.warning('Could not publish %s for design review %s, pausing events for %ss: %s',
+                       event, design_review_id, RETRY_AFTER, e)
+
+
+def publish_status(review):
+    publish(review.id, 'status', {'design_review_id': review.id, 'status': review.status})
+
+
+def publish_document(design_review_id, document_id, status):
+    publish(design_review_id, 'document', {'design_review_id': design_review_id, 'id': document_id, 'isProcessed': status})
+
+
+def publish_question(question):
+    from .serializers import ProbingQuestionsSerializer
+    publish(question.designReview_id, 'question', ProbingQuestionsSerializer(question).data)
+
+
+def score_payload(design_review_id, score):
+    return {
+        'design_review_id': design_review_id,
+        'overall_score': score.overallscore,
+        'scores': {
+            'technical_depth': score.technicalDepth,
+            'system_design': score.systemDesign,
+            'tradeoff': score.tradeoff,
+            'ownership': score.ownership,
+        },
+        'feedback_summary': score.feedbackSummary,
+        'reviewed_on': score.reviewedOn,
+    }
+
+
+def publish_score(review, score):
+    publish(review.id, 'score', score_payload(review.id, score))
@@ -0,0 +1,112 @@
+"""
+Text extraction for stored design documents.
+
+Each blob is extracted once: PDFs page by page with pypdf, plain text as a
+single page. The pages are kept in DocumentPage, keyed by the blob's digest
+like everything else derived from a document's content, so the tasks can
+send the text instead of the file. Pages that carry images but little text
+(diagrams, scans) are flagged ``sendRaw``; only those pages go to the LLM as
+PDF, cut out of the original with ``page_subset``.
+"""
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from pypdf import PdfReader, PdfWriter
+from pypdf.errors import PyPdfError
+
+from . import metrics
+from .models import DocumentBlob, DocumentPage
+from .page_index import term_counts
+
+logger = logging.getLogger(__name__)
+
+
+def _image_count(page):
+    # Counted from the page resources, without decoding the images
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources else None
+    if not xobjects:
+        return 0
+    return sum(1 for ref in xobjects.get_object().values() if ref.get_object().get('/Subtype') == '/Image')
+
+
+def _pdf_pages(path):
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, 1):
+        text = (page.extract_text() or '').strip()
+        images = _image_count(page)
+        send_raw = images > 0 and len(text) < settings.EXTRACTION_IMAGE_PAGE_MAX_CHARS
+        yield DocumentPage(pageNumber=number, text=text, imageCount=images, sendRaw=send_raw)
+
+
+def _text_pages(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as fh:
+        yield DocumentPage(pageNumber=1, text=fh.read().strip())
+
+
+EXTRACTORS = {
+    'application/pdf': _pdf_pages,
+    'text/plain': _text_pages,
+}
+
+
+def extract_blob(blob):
+    """
+    Extract the pages of a blob unless that has been done. A blob whose type
+    has no extractor, or whose file cannot be parsed, is marked extracted
+    without pages and keeps being sent as it is.
+    """
+    if blob.extractedOn is not None:
+        return
+    extractor = EXTRACTORS.get(blob.mimeType)
+    pages = []
+    if extractor is not None:
+        try:
+            with metrics.timer('extraction.blob'):
+                pages = list(extractor(os.path.join(settings.MEDIA_ROOT, blob.path)))
+        except (OSError, PyPdfError, ValueError) as e:
+            logger.warning('Could not extract text from blob %s: %s', blob.digest, e)
+            metrics.incr('extraction.errors')
+            pages = []
+    for page in pages:
+        page.blob = blob
+        page.termCounts, page.termLength = term_counts(page.text)
+    if blob.mimeType == 'application/pdf' and pages:
+        # The scan done while uploading misses compressed page objects
+        blob.pageCount = len(pages)
+    blob.extractedOn = timezone.now()
+    with transaction.atomic():
+        # Another worker may have extracted the same content meanwhile
+        if not DocumentBlob.objects.filter(digest=blob.digest, extractedOn__isnull=True).update(
+                extractedOn=blob.extractedOn, pageCount=blob.pageCount):
+            return
+        DocumentPage.objects.bulk_create(pages)
+    metrics.incr('extraction.pages', len(pages))
+
+
+def ensure_extracted(documents):
+    """
+    Extract the blobs of the given documents that have not been extracted.
+    """
+    seen = set()
+    for document in documents:
+        if document.blob_id and document.blob_id not in seen and document.blob.extractedOn is None:
+            seen.add(document.blob_id)
+            extract_blob(document.blob)
+
+
+def page_subset(path, page_numbers):
+    """
+    Return the bytes of a PDF holding only the given (1-based) pages.
+    """
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number - 1])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,207 @@
+"""
+Process-wide Gemini client.
+
+Each Celery worker process builds one ``genai.Client`` (in the
+``worker_process_init`` hook, or lazily on first use elsewhere) and reuses it
+for every task, so TLS sessions and HTTP connections are kept alive between
+reviews instead of being rebuilt per call. Connection setup and request timings
+are recorded in ``api.metrics`` and logged side by side for every call.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from google import genai
+from google.genai import types
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+_call = threading.local()
+
+SETUP_TIMINGS = ('gemini.connect_tcp', 'gemini.start_tls')
+REQUEST_TIMINGS = ('gemini.time_to_headers', 'gemini.send_message')
+
+
+def _record(name, seconds):
+    metrics.observe(name, seconds)
+    stats = getattr(_call, 'stats', None)
+    if stats is not None:
+        stats[name] = stats.get(name, 0.0) + seconds
+
+
+def _trace_request(request):
+    """
+    httpx request hook: attach an httpcore trace callback that times TCP
+    connect and TLS handshake whenever a new pooled connection is opened.
+    """
+    started = {}
+    request.extensions['_sent_at'] = time.perf_counter()
+
+    def trace(event_name, info):
+        step, _, phase = event_name.rpartition('.')
+        if step not in ('connection.connect_tcp', 'connection.start_tls'):
+            return
+        if phase == 'started':
+            started[step] = time.perf_counter()
+        elif phase == 'complete' and step in started:
+            _record(f'gemini.{step.split(".", 1)[1]}', time.perf_counter() - started[step])
+            if step == 'connection.connect_tcp':
+                metrics.incr('gemini.connections_opened')
+
+    request.extensions['trace'] = trace
+
+
+def _trace_response(response):
+    sent_at = response.request.extensions.get('_sent_at')
+    if sent_at is not None:
+        _record('gemini.time_to_headers', time.perf_counter() - sent_at)
+    metrics.incr('gemini.http_requests')
+
+
+async def _atrace_request(request):
+    # httpcore awaits trace callbacks on async connections
+    _trace_request(request)
+    trace = request.extensions['trace']
+
+    async def atrace(event_name, info):
+        trace(event_name, info)
+
+    request.extensions['trace'] = atrace
+
+
+async def _atrace_response(response):
+    _trace_response(response)
+
+
+def _build_client():
+    if not settings.GEMINI_API_KEY:
+        raise ImproperlyConfigured('GEMINI_API_KEY is not set; export it in the worker environment.')
+    limits = httpx.Limits(
+        max_connections=settings.GEMINI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GEMINI_HTTP_KEEPALIVE_EXPIRY,
+    )
+    http_options = types.HttpOptions(
+        timeout=settings.GEMINI_HTTP_TIMEOUT_MS,
+        client_args={
+            'limits': limits,
+            'event_hooks': {'request': [_trace_request], 'response': [_trace_response]},
+        },
+        # Used by client.aio when LLM_EXECUTION is 'async' (api/async_llm.py);
+        # passed ready-made so the SDK never switches to another HTTP library
+        httpx_async_client=httpx.AsyncClient(
+            limits=limits,
+            event_hooks={'request': [_atrace_request], 'response': [_atrace_response]},
+        ),
+    )
+    with metrics.timer('gemini.client_init'):
+        return genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+
+
+def get_client():
+    """
+    Return this process's Gemini client, creating it on first use. A client
+    inherited across fork is discarded so pooled sockets are never shared.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client()
+                _client_pid = pid
+    return _client
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            try:
+                _client.close()
+            except Exception:
+                logger.exception('Could not close Gemini client')
+        _client = None
+        _client_pid = None
+
+
+@contextmanager
+def timed_call(label):
+    """
+    Time one Gemini call and log its connection setup time next to its
+    request time, e.g. ``setup=0.0ms request=812.4ms`` for a reused connection.
+    """
+    _call.stats = {}
+    start = time.perf_counter()
+    try:
+        yield _call.stats
+    finally:
+        stats = _call.stats
+        _call.stats = None
+        elapsed = time.perf_counter() - start
+        metrics.observe('gemini.send_message', elapsed)
+        stats['gemini.send_message'] = elapsed
+        setup_ms = sum(stats.get(name, 0.0) for name in SETUP_TIMINGS) * 1000
+        logger.info(
+            'gemini %s: setup=%.1fms (tcp=%.1fms tls=%.1fms) time_to_headers=%.1fms request=%.1fms',
+            label, setup_ms,
+            stats.get('gemini.connect_tcp', 0.0) * 1000,
+            stats.get('gemini.start_tls', 0.0) * 1000,
+            stats.get('gemini.time_to_headers', 0.0) * 1000,
+            stats.get('gemini.send_message', 0.0) * 1000,
+        )
+
+
+@contextmanager
+def async_timed_call(label):
+    """
+    timed_call for calls made on the async loop, where many calls share one
+    thread: records the request time, without the per-call setup breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe('gemini.send_message', elapsed)
+        logger.info('gemini %s (async): request=%.1fms', label, elapsed * 1000)
+
+
+def connection_summary():
+    """
+    Connection setup vs request latency for this process, from ``api.metrics``.
+    """
+    snapshot = metrics.snapshot()
+    timings, counters = snapshot['timings'], snapshot['counters']
+    return {
+        'setup': {name: timings[name] for name in SETUP_TIMINGS if name in timings},
+        'request': {name: timings[name] for name in REQUEST_TIMINGS if name in timings},
+        'connections_opened': counters.get('gemini.connections_opened', 0),
+        'http_requests': counters.get('gemini.http_requests', 0),
+    }
+
+
+@worker_process_init.connect
+def init_worker_client(**kwargs):
+    try:
+        get_client()
+    except ImproperlyConfigured:
+        # Tasks will raise the same error when they first need the client.
+        logger.exception('Gemini client not initialised for worker %s', os.getpid())
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_client(**kwargs):
+    logger.info('Gemini connection metrics for worker %s: %s', os.getpid(), connection_summary())
+    close_client()
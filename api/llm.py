@@ -0,0 +1,502 @@
+"""
+LLM backend layer.
+
+Tasks describe a call as an ``LLMRequest`` and hand it to ``get_backend()``,
+which returns the backend named by ``settings.LLM_BACKEND`` (a dotted path,
+like Django's EMAIL_BACKEND) configured with ``settings.LLM_BACKEND_OPTIONS``.
+
+``GeminiBackend`` talks to Gemini through the pooled client.
+``LocalBackend`` never leaves the process: it returns deterministic,
+schema-valid JSON after a simulated latency and fails at a configurable rate,
+so the Celery pipeline can be load tested without spending quota.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import pathlib
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.genai import types
+
+from . import metrics
+from .extraction import page_subset
+from .gemini_client import async_timed_call, get_client, timed_call
+from .gemini_models import EvaluationResponse, QuestionCategory, QuestionsResponse
+
+
+class LLMError(Exception):
+    """
+    Raised by a backend when a call fails.
+    """
+
+
+class TransientLLMError(LLMError):
+    """
+    A failure that may well succeed when retried (backend overloaded,
+    connection dropped).
+    """
+
+
+class LLMTimeout(TransientLLMError):
+    """
+    Raised when a call runs past its deadline (``LLMRequest.timeout``).
+    """
+
+
+@dataclass
+class DocumentPart:
+    digest: str
+    path: Optional[str] = None  # absolute path of the stored file
+    mime_type: str = 'application/pdf'
+    text: Optional[str] = None  # extracted text, sent instead of the file
+    pages: Optional[List[int]] = None  # send only these pages of the PDF
+    page_count: Optional[int] = None  # pages of the stored file, when known
+
+    def read_bytes(self):
+        if self.pages:
+            return page_subset(self.path, self.pages)
+        return pathlib.Path(self.path).read_bytes()
+
+    def payload_size(self):
+        """
+        Bytes this part adds to a request.
+        """
+        if self.text is not None:
+            return len(self.text.encode('utf-8'))
+        if self.path is None:
+            return 0
+        return len(self.read_bytes()) if self.pages else os.path.getsize(self.path)
+
+
+@dataclass
+class LLMRequest:
+    purpose: str  # 'questions' or 'evaluation'; used for metrics and logs
+    model: str
+    system_instruction: str
+    prompt: str  # first user turn, sent along with the documents
+    message: str  # follow-up message the model answers
+    response_schema: type
+    documents: List[DocumentPart] = field(default_factory=list)
+    # Cached-content handle holding the documents (see api.context_cache).
+    # When set, the documents are not sent again with the request.
+    context: Optional[str] = None
+    design_review_id: Optional[int] = None  # for the LLMCall log
+    compacted: bool = False  # document pages were dropped to fit the token budget
+    # False when the documents are a selection of their pages: a shared
+    # context for that selection would serve this request only
+    share_context: bool = True
+    timeout: Optional[float] = None  # seconds; the call fails with a timeout past it
+
+
+# System instruction stored with a shared document context. Per-task
+# instructions then travel in the user turn, because a request that uses
+# cached content cannot carry its own system instruction.
+CONTEXT_SYSTEM_PROMPT = (
+    "You are a senior software architect. The attached files are the candidate's design documents. "
+    "Follow the task instructions given in the user's message."
+)
+
+
+class LLMBackend:
+    name = 'base'
+
+    def generate(self, request: LLMRequest) -> str:
+        """
+        Run the request and return the raw JSON response text.
+        """
+        raise NotImplementedError
+
+    def stream(self, request: LLMRequest):
+        """
+        Run the request and yield the response text in chunks as it arrives.
+        Backends without streaming yield the whole response at once.
+        """
+        yield self.generate(request)
+
+    async def agenerate(self, request: LLMRequest) -> str:
+        """
+        Async counterpart of generate, used with LLM_EXECUTION = 'async'.
+        Backends without an async client run generate in a thread.
+        """
+        return await asyncio.to_thread(self.generate, request)
+
+    async def astream(self, request: LLMRequest):
+        """
+        Async counterpart of stream.
+        """
+        yield await self.agenerate(request)
+
+    def create_context(self, model, documents, ttl_seconds):
+        """
+        Upload documents once and return a handle later requests can pass as
+        ``LLMRequest.context``, or None if the backend does not cache content.
+        """
+        return None
+
+
+def iter_array_items(chunks, key):
+    """
+    Incrementally parse a streamed JSON object and yield the raw text of each
+    complete element of its top-level array ``key`` as soon as the element's
+    closing brace has arrived, e.g. every ``{...}`` in ``{"Questions": [...]}``.
+    """
+    buffer = ''
+    pos = 0
+    array_start = None  # index just past the '[' of the array
+    depth = 0
+    in_string = False
+    escaped = False
+    item_start = None
+    marker = f'"{key}"'
+
+    for chunk in chunks:
+        buffer += chunk
+        if array_start is None:
+            found = buffer.find(marker)
+            if found == -1:
+                continue
+            bracket = buffer.find('[', found + len(marker))
+            if bracket == -1:
+                continue
+            array_start = pos = bracket + 1
+
+        while pos < len(buffer):
+            char = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                if depth == 0:
+                    item_start = pos
+                depth += 1
+            elif char in '}]':
+                if depth == 0:  # end of the array itself
+                    return
+                depth -= 1
+                if depth == 0:
+                    yield buffer[item_start:pos + 1]
+                    # Drop consumed text so the buffer stays small.
+                    buffer = buffer[pos + 1:]
+                    pos = -1
+                    item_start = None
+            pos += 1
+
+
+def record_payload(request, document_bytes):
+    """
+    Count what a call actually sends, so the effect of context caching shows
+    up as smaller payloads.
+    """
+    size = len(request.prompt) + len(request.message) + document_bytes
+    if not request.context:
+        size += len(request.system_instruction)
+    metrics.incr(f'llm.{request.purpose}.calls')
+    metrics.incr(f'llm.{request.purpose}.payload_bytes', size)
+    if request.context:
+        metrics.incr(f'llm.{request.purpose}.context_hits')
+    return size
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, **options):
+        self.options = options
+
+    @staticmethod
+    def _document_parts(documents):
+        return [
+            types.Part(text=d.text) if d.text is not None
+            else types.Part.from_bytes(data=d.read_bytes(), mime_type=d.mime_type)
+            for d in documents
+        ]
+
+    def _history(self, request):
+        if request.context:
+            parts = [types.Part(text=request.system_instruction), types.Part(text=request.prompt)]
+        else:
+            parts = [types.Part(text=request.prompt)] + self._document_parts(request.documents)
+        return [types.Content(role="user", parts=parts)]
+
+    def _config(self, request):
+        # The deadline applies to this request only, not to the pooled client
+        http_options = types.HttpOptions(timeout=int(request.timeout * 1000)) if request.timeout else None
+        if request.context:
+            return types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=request.response_schema,
+                cached_content=request.context,
+                http_options=http_options,
+            )
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=request.response_schema,
+            system_instruction=types.Content(role="system", parts=[types.Part(text=request.system_instruction)]),
+            http_options=http_options,
+        )
+
+    def create_context(self, model, documents, ttl_seconds):
+        cached = get_client().caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=self._document_parts(documents))],
+                system_instruction=CONTEXT_SYSTEM_PROMPT,
+                ttl=f"{int(ttl_seconds)}s",
+            ),
+        )
+        return cached.name
+
+    def _chat(self, request, chats=None):
+        history = self._history(request)
+        # The first part is the prompt; the documents follow it
+        document_bytes = 0 if request.context else sum(
+            len(p.inline_data.data) if p.inline_data else len(p.text.encode('utf-8')) for p in history[0].parts[1:])
+        record_payload(request, document_bytes)
+        return (chats or get_client().chats).create(
+            model=request.model,
+            history=history,
+            config=self._config(request),
+        )
+
+    def generate(self, request):
+        chat = self._chat(request)
+        with timed_call(request.purpose):
+            response = chat.send_message(request.message)
+        return response.text
+
+    def stream(self, request):
+        chat = self._chat(request)
+        with timed_call(request.purpose):
+            start = time.perf_counter()
+            first = True
+            for chunk in chat.send_message_stream(request.message):
+                if first:
+                    metrics.observe(f'llm.{request.purpose}.time_to_first_chunk', time.perf_counter() - start)
+                    first = False
+                if chunk.text:
+                    yield chunk.text
+
+    async def agenerate(self, request):
+        # Reading the documents is blocking file I/O; keep it off the loop
+        chat = await asyncio.to_thread(self._chat, request, get_client().aio.chats)
+        with async_timed_call(request.purpose):
+            response = await chat.send_message(request.message)
+        return response.text
+
+    async def astream(self, request):
+        chat = await asyncio.to_thread(self._chat, request, get_client().aio.chats)
+        with async_timed_call(request.purpose):
+            start = time.perf_counter()
+            first = True
+            async for chunk in await chat.send_message_stream(request.message):
+                if first:
+                    metrics.observe(f'llm.{request.purpose}.time_to_first_chunk', time.perf_counter() - start)
+                    first = False
+                if chunk.text:
+                    yield chunk.text
+
+
+class LocalBackend(LLMBackend):
+    """
+    Offline stand-in for load testing.
+
+    Options (``LLM_BACKEND_OPTIONS``):
+      latency: 'fixed', 'uniform', 'lognormal' or 'exponential'
+      latency_ms: fixed value, median (lognormal) or mean (exponential)
+      latency_low_ms / latency_high_ms: bounds for 'uniform'
+      latency_sigma: shape for 'lognormal'
+      document_latency_ms: extra latency per document sent inline, which
+        a shared context (``create_context``) avoids
+      error_rate: probability (0-1) that a call raises TransientLLMError
+      seed: seed for the latency/error sequence
+
+    Response content depends only on the request, so identical requests give
+    identical answers; latency and failures follow the seeded sequence.
+    """
+    name = 'local'
+
+    def __init__(self, latency='lognormal', latency_ms=800, latency_low_ms=200, latency_high_ms=2000,
+                 latency_sigma=0.5, document_latency_ms=0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_low_ms = latency_low_ms
+        self.latency_high_ms = latency_high_ms
+        self.latency_sigma = latency_sigma
+        self.document_latency_ms = document_latency_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.contexts = {}
+
+    def sample_latency(self):
+        """
+        Next simulated latency in seconds.
+        """
+        with self._lock:
+            if self.latency == 'fixed':
+                ms = self.latency_ms
+            elif self.latency == 'uniform':
+                ms = self._rng.uniform(self.latency_low_ms, self.latency_high_ms)
+            elif self.latency == 'exponential':
+                ms = self._rng.expovariate(1.0 / self.latency_ms) if self.latency_ms else 0
+            elif self.latency == 'lognormal':
+                ms = self._rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma) if self.latency_ms else 0
+            else:
+                raise ValueError(f"Unknown latency distribution: {self.latency}")
+        return max(ms, 0) / 1000.0
+
+    def _should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def create_context(self, model, documents, ttl_seconds):
+        handle = 'local-context/' + hashlib.sha256(
+            '\x1f'.join([model] + sorted(d.digest for d in documents)).encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            self.contexts[handle] = [d.digest for d in documents]
+        return handle
+
+    def _delay(self, request):
+        delay = self.sample_latency()
+        if not request.context:
+            delay += len(request.documents) * self.document_latency_ms / 1000.0
+        return delay
+
+    @staticmethod
+    def _past_deadline(request, delay):
+        # A call slower than its deadline fails once the deadline has passed
+        return request.timeout is not None and delay > request.timeout
+
+    @staticmethod
+    def _timeout(request):
+        metrics.incr('llm.local.timeouts')
+        return LLMTimeout(f"Simulated {request.purpose} call exceeded its {request.timeout}s deadline")
+
+    def _respond(self, request):
+        # Handles are derived from content, so one created by another
+        # process is as good as our own.
+        if request.context and not request.context.startswith('local-context/'):
+            raise LLMError(f"Unknown context {request.context}")
+        record_payload(request, 0 if request.context else sum(d.payload_size() for d in request.documents))
+        if self._should_fail():
+            metrics.incr('llm.local.errors')
+            raise TransientLLMError(f"Simulated {self.name} backend failure for {request.purpose}")
+        return self.render(request)
+
+    def generate(self, request):
+        delay = self._delay(request)
+        with metrics.timer(f'llm.local.{request.purpose}'):
+            if self._past_deadline(request, delay):
+                time.sleep(request.timeout)
+                raise self._timeout(request)
+            time.sleep(delay)
+        return self._respond(request)
+
+    def stream(self, request, chunk_size=64):
+        """
+        Spread the simulated latency over the rendered response, so the first
+        chunk arrives after roughly a tenth of the total time.
+        """
+        delay = self._delay(request)
+        if self._past_deadline(request, delay):
+            time.sleep(request.timeout)
+            raise self._timeout(request)
+        time.sleep(delay * 0.1)
+        text = self._respond(request)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for chunk in chunks:
+            yield chunk
+            time.sleep(delay * 0.9 / len(chunks))
+
+    async def agenerate(self, request):
+        delay = self._delay(request)
+        with metrics.timer(f'llm.local.{request.purpose}'):
+            if self._past_deadline(request, delay):
+                await asyncio.sleep(request.timeout)
+                raise self._timeout(request)
+            await asyncio.sleep(delay)
+        return self._respond(request)
+
+    async def astream(self, request, chunk_size=64):
+        delay = self._delay(request)
+        if self._past_deadline(request, delay):
+            await asyncio.sleep(request.timeout)
+            raise self._timeout(request)
+        await asyncio.sleep(delay * 0.1)
+        text = self._respond(request)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(delay * 0.9 / len(chunks))
+
+    def render(self, request):
+        """
+        Deterministic JSON for the request's response schema.
+        """
+        seed = hashlib.sha256(
+            '\x1f'.join([request.model, request.system_instruction, request.prompt, request.message]
+                        + [d.digest for d in request.documents]).encode('utf-8')
+        ).hexdigest()
+        rng = random.Random(seed)
+        if request.response_schema is QuestionsResponse:
+            categories = [c.value for c in QuestionCategory]
+            questions = [
+                {
+                    'question': f"[{seed[:8]}] Question {i}: how does the design handle {rng.choice(categories).lower()} concerns?",
+                    'difficulty': rng.randint(1, 10),
+                    'category': rng.choice(categories),
+                }
+                for i in range(1, rng.randint(5, 10) + 1)
+            ]
+            payload = {'Questions': questions}
+        elif request.response_schema is EvaluationResponse:
+            payload = {
+                'designReviewScore': {
+                    'technicalDepth': rng.randint(1, 5),
+                    'systemDesign': rng.randint(1, 5),
+                    'tradeoff': rng.randint(1, 5),
+                    'ownership': rng.randint(1, 5),
+                    'detailedFeedbackSummary': f"[{seed[:8]}] Simulated evaluation feedback.",
+                }
+            }
+        else:
+            raise LLMError(f"{self.name} backend cannot render {request.response_schema!r}")
+        # Round-trip through the schema so the output is guaranteed valid.
+        return request.response_schema.model_validate(payload).model_dump_json()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return this process's configured backend instance.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_cls = import_string(settings.LLM_BACKEND)
+                _backend = backend_cls(**settings.LLM_BACKEND_OPTIONS)
+    return _backend
+
+
+def reset_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+
+from api.models import Candidate, DesignReview, DesignReviewScore, ProbingQuestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the read endpoints (question listing, "
+        "evaluation, review detail) through the WSGI and ASGI handlers, in process. "
+        "Creates a sample review, runs both paths and deletes the sample again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=600, help='Requests per path and handler')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent requests in flight')
+        parser.add_argument('--questions', type=int, default=10, help='Questions on the sample review')
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle(self, *args, **options):
+        # The in-process test clients send Host: testserver, hence the override.
+        review = self._create_sample(options['questions'])
+        paths = [
+            f'/api/design-review/{review.id}/questions/',
+            f'/api/design-review/{review.id}/evaluation/',
+            f'/api/design-review/{review.id}/',
+        ]
+        try:
+            self.stdout.write(f"{'path':<45} {'handler':<6} {'req/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+            for path in paths:
+                for handler, runner in (('wsgi', self._run_wsgi), ('asgi', self._run_asgi)):
+                    elapsed, latencies = runner(path, options['requests'], options['concurrency'])
+                    latencies.sort()
+                    self.stdout.write(
+                        f"{path:<45} {handler:<6} {len(latencies) / elapsed:>10.1f} "
+                        f"{latencies[len(latencies) // 2] * 1000:>8.2f} "
+                        f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.2f}"
+                    )
+        finally:
+            review.candidate.delete()
+
+    def _create_sample(self, question_count):
+        candidate = Candidate.objects.create(name='Benchmark Candidate', designation='Benchmark')
+        review = DesignReview.objects.create(
+            candidate=candidate, problemDescription='Benchmark', proposedArchitecture='Benchmark',
+            designTradeoffs='Benchmark', scalibilty='Benchmark', securityMeasures='Benchmark',
+            maintainability='Benchmark', status='Reviewed',
+            questionsTotal=question_count, questionsAnswered=question_count,
+        )
+        # bulk_create skips the signals that maintain the counters set above
+        ProbingQuestions.objects.bulk_create([
+            ProbingQuestions(designReview=review, question=f'Question {i}?', answer=f'Answer {i}.', difficulty=i % 10 + 1)
+            for i in range(question_count)
+        ])
+        DesignReviewScore.objects.create(
+            designReview=review, overallscore=3.5, status='Completed', reviewedOn=timezone.now(),
+            technicalDepth=4, systemDesign=3, tradeoff=4, ownership=3, feedbackSummary='Benchmark feedback.',
+        )
+        return review
+
+    def _run_wsgi(self, path, total, concurrency):
+        def fetch(_):
+            start = time.perf_counter()
+            response = Client().get(path)
+            assert response.status_code == 200, response.status_code
+            latency = time.perf_counter() - start
+            connections.close_all()
+            return latency
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, range(total)))
+        return time.perf_counter() - start, latencies
+
+    def _run_asgi(self, path, total, concurrency):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def fetch():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    assert response.status_code == 200, response.status_code
+                    return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(fetch() for _ in range(total)))
+            return time.perf_counter() - start, list(latencies)
+
+        return asyncio.run(run())
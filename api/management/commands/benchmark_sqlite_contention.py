@@ -0,0 +1,138 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import Value
+from django.test import override_settings
+from django.utils import timezone
+
+from api import review_state
+from api.models import Candidate, DesignReview, DesignReviewScore, ProbingQuestions
+
+# Django's own SQLite defaults: rollback journal, deferred transactions, 5s timeout
+PROFILES = {
+    'default': {},
+    'concurrent': settings.DATABASES['default'].get('OPTIONS', {}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run writer threads emulating the Celery tasks (saving questions and scores) "
+        "and the answer endpoints against a scratch SQLite database, once with Django's "
+        "default SQLite options and once with the options in settings, and report "
+        "throughput, latency and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Writer threads of each kind')
+        parser.add_argument('--iterations', type=int, default=50, help='Writes per thread')
+        parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                            help='Profile to run (repeatable; default: all)')
+
+    # The sample writes invalidate cached evaluations; keep that off Redis
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def handle(self, *args, **options):
+        db_settings = connections.settings['default']
+        original = {key: db_settings.get(key) for key in ('NAME', 'OPTIONS')}
+        self.stdout.write(f"{'profile':<12} {'writes/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'locked':>8}")
+        try:
+            for profile in options['profile'] or sorted(PROFILES):
+                with tempfile.TemporaryDirectory() as directory:
+                    connections.close_all()
+                    db_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+                    db_settings['OPTIONS'] = dict(PROFILES[profile])
+                    call_command('migrate', verbosity=0)
+                    reviews = self._create_sample(options['writers'])
+                    elapsed, latencies, locked = self._run(reviews, options['iterations'])
+                    connections.close_all()
+                latencies.sort()
+                self.stdout.write(
+                    f"{profile:<12} {len(latencies) / elapsed:>10.1f} "
+                    f"{statistics.median(latencies) * 1000 if latencies else 0:>8.2f} "
+                    f"{latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0:>8.2f} "
+                    f"{locked:>8}"
+                )
+        finally:
+            connections.close_all()
+            db_settings.update(original)
+
+    def _create_sample(self, count):
+        candidate = Candidate.objects.create(name='Benchmark Candidate', designation='Benchmark')
+        return [
+            DesignReview.objects.create(
+                candidate=candidate, problemDescription='Benchmark', proposedArchitecture='Benchmark',
+                designTradeoffs='Benchmark', scalibilty='Benchmark', securityMeasures='Benchmark',
+                maintainability='Benchmark', status='Questions Generated',
+            ).id
+            for _ in range(count)
+        ]
+
+    def _run(self, reviews, iterations):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def timed(write):
+            start = time.perf_counter()
+            try:
+                write()
+            except OperationalError as exc:
+                if 'locked' not in str(exc):
+                    raise
+                with lock:
+                    errors.append(exc)
+                return
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+        def task_writer(design_review_id):
+            # Question generation and evaluation: question rows, then a score
+            for i in range(iterations):
+                timed(lambda: ProbingQuestions.objects.create(
+                    designReview_id=design_review_id, question=f'Question {i}?', difficulty=i % 10 + 1))
+                if i % 10 == 9:
+                    timed(lambda: self._save_score(design_review_id))
+            connections.close_all()
+
+        def answer_writer(design_review_id):
+            for i in range(iterations):
+                timed(lambda: self._answer(design_review_id, f'Answer {i}.'))
+            connections.close_all()
+
+        threads = [threading.Thread(target=target, args=(design_review_id,))
+                   for design_review_id in reviews for target in (task_writer, answer_writer)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, latencies, len(errors)
+
+    def _save_score(self, design_review_id):
+        with transaction.atomic():
+            DesignReviewScore.objects.update_or_create(designReview_id=design_review_id, defaults={
+                'overallscore': 3.5, 'status': 'Completed', 'reviewedOn': timezone.now(),
+                'technicalDepth': 4, 'systemDesign': 3, 'tradeoff': 4, 'ownership': 3,
+                'feedbackSummary': 'Benchmark feedback.',
+            })
+
+    def _answer(self, design_review_id, answer):
+        # Same shape as the answer endpoint: read a question, then a conditional
+        # first-answer update, the answer itself and the counters in one transaction
+        with transaction.atomic():
+            question = ProbingQuestions.objects.filter(designReview_id=design_review_id).order_by('?').first()
+            if question is None:
+                return
+            now = timezone.now()
+            first = ProbingQuestions.objects.filter(id=question.id, answer__isnull=True).update(
+                answer=Value(''), updatedOn=now)
+            ProbingQuestions.objects.filter(id=question.id).update(answer=answer, updatedOn=now)
+            if first:
+                review_state.count_questions(design_review_id, answered=1)
@@ -0,0 +1,154 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+
+from api import async_llm, llm
+from api.models import Candidate, DesignReview
+from api.tasks import generate_probing_questions_for_review
+
+MODES = ('prefork', 'async')
+
+
+def _generate(design_review_id):
+    result = generate_probing_questions_for_review(design_review_id)
+    connections.close_all()
+    return result
+
+
+def _memory_kb(pid):
+    """
+    Proportional set size of a process (shared pages split between the
+    processes sharing them), or its RSS where PSS is not available.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        with open(f'/proc/{pid}/status') as fh:
+            for line in fh:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as fh:
+            return [int(child) for child in fh.read().split()]
+    except OSError:
+        return []
+
+
+class MemorySampler(threading.Thread):
+    """
+    Track the peak combined memory of the processes returned by ``pids()``.
+    """
+
+    def __init__(self, pids, interval=0.05):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, sum(_memory_kb(pid) for pid in self.pids()))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare question generation throughput per GB of worker memory between prefork "
+        "processes calling the LLM synchronously and one process running the calls on its "
+        "async loop (LLM_EXECUTION=async). Uses the offline LocalBackend with a fixed "
+        "latency; creates sample reviews and deletes them again. Linux only (reads /proc)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=64, help='Reviews to generate questions for per mode')
+        parser.add_argument('--processes', type=int, default=4, help='Prefork worker processes')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='Task threads of the async worker, also its LLM_ASYNC_CONCURRENCY')
+        parser.add_argument('--latency-ms', type=int, default=1000, help='Simulated LLM latency per call')
+        parser.add_argument('--mode', choices=MODES, action='append', help='Mode to run (repeatable; default: both)')
+
+    # The sample writes invalidate cached evaluations; keep that off Redis
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('The prefork comparison needs the fork start method.')
+        backend = {
+            'LLM_BACKEND': 'api.llm.LocalBackend',
+            'LLM_BACKEND_OPTIONS': {'latency': 'fixed', 'latency_ms': options['latency_ms']},
+            'LLM_RATE_LIMIT_ENABLED': False,
+        }
+        self.stdout.write(f"{'mode':<8} {'workers':>8} {'reviews/s':>10} {'peak MB':>9} {'reviews/s/GB':>13}")
+        for mode in options['mode'] or MODES:
+            candidate = Candidate.objects.create(name='Benchmark Candidate', designation='Benchmark')
+            try:
+                ids = [self._create_review(candidate).id for _ in range(options['reviews'])]
+                llm.reset_backend()
+                if mode == 'prefork':
+                    with override_settings(**backend):
+                        workers, elapsed, peak_kb = options['processes'], *self._run_prefork(ids, options['processes'])
+                else:
+                    with override_settings(LLM_EXECUTION='async', LLM_ASYNC_CONCURRENCY=options['threads'], **backend):
+                        workers, elapsed, peak_kb = options['threads'], *self._run_async(ids, options['threads'])
+            finally:
+                llm.reset_backend()
+                candidate.delete()
+            rate = len(ids) / elapsed
+            peak_gb = peak_kb / (1024 * 1024)
+            self.stdout.write(
+                f"{mode:<8} {workers:>8} {rate:>10.2f} {peak_kb / 1024:>9.1f} "
+                f"{rate / peak_gb if peak_gb else 0:>13.1f}"
+            )
+
+    def _create_review(self, candidate):
+        return DesignReview.objects.create(
+            candidate=candidate, problemDescription='Benchmark', proposedArchitecture='Benchmark',
+            designTradeoffs='Benchmark', scalibilty='Benchmark', securityMeasures='Benchmark',
+            maintainability='Benchmark',
+        )
+
+    def _run_prefork(self, ids, processes):
+        # Children must open their own database connections
+        connections.close_all()
+        parent = multiprocessing.current_process().pid
+        sampler = MemorySampler(lambda: _children(parent))
+        sampler.start()
+        start = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            pool.map(_generate, ids, chunksize=1)
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        return elapsed, sampler.peak_kb
+
+    def _run_async(self, ids, threads):
+        own = multiprocessing.current_process().pid
+        sampler = MemorySampler(lambda: [own])
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(_generate, ids))
+        finally:
+            async_llm.reset_runner()
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        return elapsed, sampler.peak_kb
@@ -0,0 +1,69 @@
+import signal
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def worker_command(name, pool, loglevel, concurrency=None):
+    """
+    The celery command line of one worker pool from CELERY_WORKER_POOLS.
+    """
+    worker_pool = 'prefork'
+    size = pool['concurrency']
+    if pool.get('llm') and settings.LLM_EXECUTION == 'async':
+        # One process keeps many calls in flight on its event loop
+        worker_pool, size = 'threads', settings.LLM_ASYNC_CONCURRENCY
+    return [
+        sys.executable, '-m', 'celery', '-A', 'dr_reviewer', 'worker',
+        '--hostname', f'{name}@%h',
+        '--queues', ','.join(pool['queues']),
+        '--pool', worker_pool,
+        '--concurrency', str(concurrency or size),
+        '--prefetch-multiplier', str(settings.CELERY_WORKER_PREFETCH_MULTIPLIER),
+        '--loglevel', loglevel,
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the Celery worker pools in CELERY_WORKER_POOLS: question generation (interactive lane "
+        "first), evaluation and the default queue, each sized for its work. Runs until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool', choices=sorted(settings.CELERY_WORKER_POOLS), action='append',
+                            help='Pool to start (repeatable; default: all)')
+        parser.add_argument('--loglevel', default='info', help='Celery log level (default: info)')
+        parser.add_argument('--concurrency', type=int, help="Override the pools' configured concurrency")
+        parser.add_argument('--dry-run', action='store_true', help='Print the worker commands without running them')
+
+    def handle(self, *args, **options):
+        names = options['pool'] or list(settings.CELERY_WORKER_POOLS)
+        commands = [
+            worker_command(name, settings.CELERY_WORKER_POOLS[name], options['loglevel'], options['concurrency'])
+            for name in names
+        ]
+        if options['dry_run']:
+            for command in commands:
+                self.stdout.write(' '.join(command))
+            return
+
+        workers = [subprocess.Popen(command) for command in commands]
+        self.stdout.write(f"Started {len(workers)} worker pool(s): {', '.join(names)}")
+
+        def stop(signum, frame):
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.send_signal(signal.SIGTERM)  # warm shutdown: running tasks finish
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            codes = [worker.wait() for worker in workers]
+        except KeyboardInterrupt:
+            stop(signal.SIGINT, None)
+            codes = [worker.wait() for worker in workers]
+        failed = [name for name, code in zip(names, codes) if code not in (0, -signal.SIGTERM)]
+        if failed:
+            raise CommandError(f"Worker pool(s) exited with an error: {', '.join(failed)}")
@@ -0,0 +1,112 @@
+"""
+Memoization of parsed LLM responses.
+
+``ResponseMemo`` keeps parsed Pydantic results in a per-process LRU with a
+TTL, backed by Django's cache so other worker processes can reuse a result
+too. Hits and misses are counted in ``api.metrics``.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TTLLRUCache:
+    """
+    Thread-safe LRU mapping whose entries also expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def canonical_key(prefix, **inputs):
+    """
+    Hash inputs into a stable key. Strings have their whitespace collapsed
+    so formatting-only differences map to the same key.
+    """
+    def normalize(value):
+        if isinstance(value, str):
+            return ' '.join(value.split())
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    raw = json.dumps({k: normalize(v) for k, v in inputs.items()}, sort_keys=True, separators=(',', ':'))
+    return f'{prefix}:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseMemo:
+    def __init__(self, name, maxsize=256, ttl=3600):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLLRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key, schema):
+        """
+        Return the memoized ``schema`` instance for key, or None.
+        """
+        result = self.local.get(key)
+        if result is not None:
+            metrics.incr(f'{self.name}.hit')
+            return result
+        try:
+            raw = cache.get(key)
+        except Exception:
+            logger.warning('Response memo lookup failed for %s', key, exc_info=True)
+            raw = None
+        if raw is not None:
+            result = schema.model_validate_json(raw)
+            self.local.set(key, result)
+            metrics.incr(f'{self.name}.hit')
+            metrics.incr(f'{self.name}.shared_hit')
+            return result
+        metrics.incr(f'{self.name}.miss')
+        return None
+
+    def set(self, key, result):
+        self.local.set(key, result)
+        try:
+            cache.set(key, result.model_dump_json(), self.ttl)
+        except Exception:
+            logger.warning('Response memo store failed for %s', key, exc_info=True)
+
+    def clear(self):
+        self.local.clear()
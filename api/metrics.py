@@ -0,0 +1,95 @@
+"""
+Small in-process metrics registry.
+
+Counters and timing summaries are kept per process (each web worker and each
+Celery worker process has its own). ``snapshot()`` returns a plain dict that
+can be logged or returned from an endpoint.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+# Keep the most recent samples per timing for percentile estimates.
+_SAMPLE_LIMIT = 512
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, seconds):
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            stats = _timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'samples': []}
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        samples = stats['samples']
+        samples.append(seconds)
+        if len(samples) > _SAMPLE_LIMIT:
+            del samples[0]
+
+
+@contextmanager
+def timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def count(name):
+    """
+    Number of samples observed for a timing.
+    """
+    with _lock:
+        stats = _timings.get(name)
+        return stats['count'] if stats else 0
+
+
+def percentile(name, pct):
+    """
+    Return the given percentile (0-100) of recent samples, or None.
+    """
+    with _lock:
+        stats = _timings.get(name)
+        if not stats or not stats['samples']:
+            return None
+        samples = sorted(stats['samples'])
+    index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+def snapshot():
+    with _lock:
+        timings = {}
+        for name, stats in _timings.items():
+            samples = sorted(stats['samples'])
+            timings[name] = {
+                'count': stats['count'],
+                'avg_ms': round(stats['total'] / stats['count'] * 1000, 3),
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+                'max_ms': round(stats['max'] * 1000, 3),
+            }
+        # '<name>.hit' / '<name>.miss' counter pairs as '<name>' -> hit rate
+        hit_rates = {}
+        for name, hits in _counters.items():
+            if name.endswith('.hit'):
+                prefix = name[:-len('.hit')]
+                total = hits + _counters.get(prefix + '.miss', 0)
+                hit_rates[prefix] = round(hits / total, 4) if total else None
+        return {'counters': dict(_counters), 'timings': timings, 'hit_rates': hit_rates}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_designdocument_isprocessed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('path', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refCount', models.PositiveIntegerField(default=0)),
+                ('createdOn', models.DateTimeField(auto_now_add=True)),
+                ('updatedOn', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='designdocument',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='designdocument',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='api.documentblob'),
+        ),
+    ]
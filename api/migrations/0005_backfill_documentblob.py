@@ -0,0 +1,45 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import migrations
+
+
+def link_existing_documents(apps, schema_editor):
+    """
+    Hash files uploaded before the blob store existed and point their
+    DesignDocument rows at a DocumentBlob. Files stay where they are; the
+    blob's path is the first document's path seen for that content. Rows
+    whose file is missing are left without a blob.
+    """
+    DesignDocument = apps.get_model('api', 'DesignDocument')
+    DocumentBlob = apps.get_model('api', 'DocumentBlob')
+    for document in DesignDocument.objects.filter(blob__isnull=True).iterator():
+        full_path = os.path.join(settings.MEDIA_ROOT, document.path)
+        if not os.path.isfile(full_path):
+            continue
+        h = hashlib.sha256()
+        with open(full_path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(64 * 1024), b''):
+                h.update(chunk)
+        blob, _ = DocumentBlob.objects.get_or_create(
+            digest=h.hexdigest(),
+            defaults={'path': document.path, 'size': os.path.getsize(full_path), 'refCount': 0},
+        )
+        blob.refCount += 1
+        blob.save(update_fields=['refCount'])
+        document.blob = blob
+        if not document.name:
+            document.name = os.path.basename(document.path)
+        document.save(update_fields=['blob', 'name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_documentblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_existing_documents, migrations.RunPython.noop),
+    ]
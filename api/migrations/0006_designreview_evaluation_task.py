@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_backfill_documentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designreview',
+            name='evaluationTaskId',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='designreview',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Incomplete', 'Incomplete'), ('Completed', 'Completed'), ('Questions Generated', 'Questions Generated'), ('In Progress', 'In Progress'), ('Evaluating', 'Evaluating'), ('Reviewed', 'Reviewed'), ('Finalized', 'Finalized')], default='Pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_designreview_evaluation_task'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='designdocument',
+            index=models.Index(fields=['designReview', 'updatedOn'], name='api_designd_designR_5814ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='designreviewscore',
+            index=models.Index(fields=['designReview', 'updatedOn'], name='api_designr_designR_18021d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='probingquestions',
+            index=models.Index(fields=['designReview', 'updatedOn'], name='api_probing_designR_ae1663_idx'),
+        ),
+    ]
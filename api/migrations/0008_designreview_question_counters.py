@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_existing_questions(apps, schema_editor):
+    """
+    Fill the new counters from the questions that already exist, in one
+    UPDATE over all reviews.
+    """
+    DesignReview = apps.get_model('api', 'DesignReview')
+    ProbingQuestions = apps.get_model('api', 'ProbingQuestions')
+
+    def per_review(questions):
+        counts = questions.filter(designReview=OuterRef('pk')).order_by().values('designReview').annotate(n=Count('id'))
+        return Coalesce(Subquery(counts.values('n'), output_field=IntegerField()), Value(0))
+
+    DesignReview.objects.update(
+        questionsTotal=per_review(ProbingQuestions.objects.all()),
+        questionsAnswered=per_review(ProbingQuestions.objects.filter(answer__isnull=False)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_updatedon_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designreview',
+            name='questionsAnswered',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='designreview',
+            name='questionsTotal',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_questions, migrations.RunPython.noop),
+    ]
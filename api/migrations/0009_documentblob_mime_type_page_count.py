@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:48
+
+import os
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of the sniffing in api/upload_handlers.py as of this
+# migration, so later changes there do not change what it backfills.
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0', 'application/x-ole-storage'),
+)
+PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+PDF_PAGE_OVERLAP = 32
+
+
+def sniff_mime_type(head):
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        if exc.start < len(head) - 3:
+            return 'application/octet-stream'
+    return 'text/plain'
+
+
+def sniff_file(path, chunk_size=64 * 1024):
+    with open(path, 'rb') as fh:
+        data = fh.read(chunk_size)
+        mime_type = sniff_mime_type(data[:512])
+        if mime_type != 'application/pdf':
+            return mime_type, None
+        pages, tail = 0, b''
+        while data:
+            window = tail + data
+            keep_from = max(0, len(window) - PDF_PAGE_OVERLAP)
+            for match in PDF_PAGE.finditer(window):
+                if match.end() == len(window):
+                    keep_from = min(keep_from, match.start())
+                    break
+                pages += 1
+                keep_from = max(keep_from, match.end())
+            tail = window[keep_from:]
+            data = fh.read(chunk_size)
+    return mime_type, pages or None
+
+
+def sniff_existing_blobs(apps, schema_editor):
+    """
+    Fill in the MIME type and page count of blobs stored before uploads were
+    sniffed. Blobs whose file is missing keep None.
+    """
+    DocumentBlob = apps.get_model('api', 'DocumentBlob')
+    for blob in DocumentBlob.objects.filter(mimeType__isnull=True).iterator():
+        full_path = os.path.join(settings.MEDIA_ROOT, blob.path)
+        if not os.path.isfile(full_path):
+            continue
+        blob.mimeType, blob.pageCount = sniff_file(full_path)
+        blob.save(update_fields=['mimeType', 'pageCount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_designreview_question_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='mimeType',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='pageCount',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(sniff_existing_blobs, migrations.RunPython.noop),
+    ]
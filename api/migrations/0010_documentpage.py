@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_documentblob_mime_type_page_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='extractedOn',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DocumentPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pageNumber', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True, default='')),
+                ('imageCount', models.PositiveIntegerField(default=0)),
+                ('sendRaw', models.BooleanField(default=False)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='api.documentblob')),
+            ],
+            options={
+                'ordering': ['pageNumber'],
+                'constraints': [models.UniqueConstraint(fields=('blob', 'pageNumber'), name='unique_document_page')],
+            },
+        ),
+    ]
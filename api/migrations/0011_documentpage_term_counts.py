@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:53
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+# Frozen copy of the tokenizer in api/page_index.py as of this migration, so
+# later changes there do not change what it backfills.
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+    a an and are as at be by can do does for from has have how if in into is it its of on or
+    that the their then there these this to was were what when where which while who why will
+    with would you your
+'''.split())
+
+
+def _stem(term):
+    if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+
+def term_counts(text):
+    terms = [_stem(t) for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+    return dict(Counter(terms)), len(terms)
+
+
+def index_existing_pages(apps, schema_editor):
+    """
+    Count the terms of pages extracted before pages were indexed.
+    """
+    DocumentPage = apps.get_model('api', 'DocumentPage')
+    for page in DocumentPage.objects.filter(termLength=0).exclude(text='').iterator():
+        page.termCounts, page.termLength = term_counts(page.text)
+        page.save(update_fields=['termCounts', 'termLength'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_documentpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentpage',
+            name='termCounts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='documentpage',
+            name='termLength',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(index_existing_pages, migrations.RunPython.noop),
+    ]
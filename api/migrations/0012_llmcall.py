@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_documentpage_term_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=100)),
+                ('estimatedTokens', models.PositiveIntegerField()),
+                ('promptChars', models.PositiveIntegerField()),
+                ('documentParts', models.PositiveIntegerField(default=0)),
+                ('compacted', models.BooleanField(default=False)),
+                ('createdOn', models.DateTimeField(auto_now_add=True)),
+                ('designReview', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='llm_calls', to='api.designreview')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['designReview', 'createdOn'], name='api_llmcall_designR_555a8d_idx')],
+            },
+        ),
+    ]
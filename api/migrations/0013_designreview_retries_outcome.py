@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_llmcall'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='designreview',
+            name='evaluationOutcome',
+            field=models.CharField(blank=True, choices=[('retrying', 'Retrying'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='designreview',
+            name='evaluationRetries',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='designreview',
+            name='generationOutcome',
+            field=models.CharField(blank=True, choices=[('retrying', 'Retrying'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='designreview',
+            name='generationRetries',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='designreview',
+            name='lastError',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
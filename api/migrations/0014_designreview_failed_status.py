@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_designreview_retries_outcome'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='designreview',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Incomplete', 'Incomplete'), ('Completed', 'Completed'), ('Questions Generated', 'Questions Generated'), ('In Progress', 'In Progress'), ('Evaluating', 'Evaluating'), ('Reviewed', 'Reviewed'), ('Finalized', 'Finalized'), ('Failed', 'Failed')], default='Pending', max_length=20),
+        ),
+    ]
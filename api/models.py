@@ -18,8 +18,15 @@ class DesignReview(models.Model):
         ('Completed', 'Completed'),
         ('Questions Generated', 'Questions Generated'),
         ('In Progress', 'In Progress'),
+        ('Evaluating', 'Evaluating'),
         ('Reviewed', 'Reviewed'),
         ('Finalized', 'Finalized'),
+        ('Failed', 'Failed'),
+    ]
+    OUTCOME_CHOICES = [
+        ('retrying', 'Retrying'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
     ]
     problemDescription = models.TextField()
     proposedArchitecture = models.TextField()
@@ -31,12 +38,69 @@ class DesignReview(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     submissionDate = models.DateTimeField(auto_now_add=True)
     overallScore = models.IntegerField(null=True, blank=True)
+    # Celery task id of the evaluation that owns the 'Evaluating' status
+    evaluationTaskId = models.CharField(max_length=255, null=True, blank=True)
+    # Denormalized question counters, kept up to date with F() updates by
+    # api.review_state so completeness is a single-row read
+    questionsTotal = models.PositiveIntegerField(default=0)
+    questionsAnswered = models.PositiveIntegerField(default=0)
+    # Retries and outcome of the question generation and evaluation tasks,
+    # with the last error they hit (api/retries.py)
+    generationRetries = models.PositiveIntegerField(default=0)
+    generationOutcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, null=True, blank=True)
+    evaluationRetries = models.PositiveIntegerField(default=0)
+    evaluationOutcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, null=True, blank=True)
+    lastError = models.TextField(blank=True, default='')
     createdOn = models.DateTimeField(auto_now_add=True)
     updatedOn = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"DesignReview {self.id} for {self.candidate.name}"
 
+class DocumentBlob(models.Model):
+    """
+    A stored file keyed by the SHA-256 digest of its content. Every
+    DesignDocument with identical bytes points at the same blob; refCount
+    tracks how many of them do so the file can be removed with the last one.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    path = models.CharField(max_length=255)  # relative to MEDIA_ROOT
+    size = models.PositiveBigIntegerField()
+    # Sniffed from the content on upload; unknown for blobs stored before
+    mimeType = models.CharField(max_length=100, null=True, blank=True)
+    pageCount = models.PositiveIntegerField(null=True, blank=True)
+    # Set once the text has been extracted into DocumentPage (api/extraction.py)
+    extractedOn = models.DateTimeField(null=True, blank=True)
+    refCount = models.PositiveIntegerField(default=0)
+    createdOn = models.DateTimeField(auto_now_add=True)
+    updatedOn = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.digest
+
+class DocumentPage(models.Model):
+    """
+    Text extracted from one page of a stored document. Keyed by the blob, so
+    identical uploads are extracted once.
+    """
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.CASCADE, related_name='pages')
+    pageNumber = models.PositiveIntegerField()  # 1-based
+    text = models.TextField(blank=True, default='')
+    imageCount = models.PositiveIntegerField(default=0)
+    sendRaw = models.BooleanField(default=False)  # mostly images: the page itself is sent
+    # Term frequencies and length in terms, for ranking pages (api/page_index.py)
+    termCounts = models.JSONField(default=dict, blank=True)
+    termLength = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['pageNumber']
+        constraints = [
+            models.UniqueConstraint(fields=['blob', 'pageNumber'], name='unique_document_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.blob_id} page {self.pageNumber}"
+
 class DesignDocument(models.Model):
     PROCESS_STATUS_CHOICES = [
         ('error', 'Error'),
@@ -47,6 +111,8 @@ class DesignDocument(models.Model):
     ]
     isProcessed = models.CharField(max_length=10, choices=PROCESS_STATUS_CHOICES, default='pending')
     path = models.CharField(max_length=255)  # store static file path as string
+    name = models.CharField(max_length=255, blank=True, default='')  # original upload name
+    blob = models.ForeignKey(DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='documents')
     type = models.CharField(max_length=10)
     size = models.PositiveIntegerField()
     designReview = models.ForeignKey(DesignReview, on_delete=models.CASCADE, related_name='documents')
@@ -56,6 +122,10 @@ class DesignDocument(models.Model):
     def __str__(self):
         return self.path
 
+    class Meta:
+        # Serves the MAX(updatedOn) per review behind conditional GETs
+        indexes = [models.Index(fields=['designReview', 'updatedOn'])]
+
 class ProbingQuestions(models.Model):
     question = models.TextField()
     answer = models.TextField(blank=True, null=True)
@@ -67,6 +137,10 @@ class ProbingQuestions(models.Model):
     def __str__(self):
         return self.question
 
+    class Meta:
+        # Serves the MAX(updatedOn) per review behind conditional GETs
+        indexes = [models.Index(fields=['designReview', 'updatedOn'])]
+
 class DesignReviewScore(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -87,3 +161,28 @@ class DesignReviewScore(models.Model):
 
     def __str__(self):
         return f"Score for Review {self.designReview.id}"
+
+    class Meta:
+        # Serves the MAX(updatedOn) per review behind conditional GETs
+        indexes = [models.Index(fields=['designReview', 'updatedOn'])]
+
+
+class LLMCall(models.Model):
+    """
+    A request to the LLM backend, recorded with its estimated size just
+    before it is sent, so expensive reviews can be found.
+    """
+    designReview = models.ForeignKey(DesignReview, on_delete=models.CASCADE, null=True, blank=True, related_name='llm_calls')
+    purpose = models.CharField(max_length=20)  # 'questions' or 'evaluation'
+    model = models.CharField(max_length=100)
+    estimatedTokens = models.PositiveIntegerField()
+    promptChars = models.PositiveIntegerField()  # instructions, prompt, message and document text
+    documentParts = models.PositiveIntegerField(default=0)
+    compacted = models.BooleanField(default=False)  # pages were dropped to fit the budget
+    createdOn = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['designReview', 'createdOn'])]
+
+    def __str__(self):
+        return f"{self.purpose} call for DesignReview {self.designReview_id}"
@@ -0,0 +1,105 @@
+"""
+BM25 ranking of extracted document pages.
+
+Every DocumentPage stores its term counts when it is extracted, so indexing
+happens once per uploaded file. For an evaluation the pages of the review's
+documents are put into an in-memory inverted index and each probing question
+(with its answer) and the proposed architecture are run against it; the best
+pages per query are kept until the context token budget is used up.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from .prompt_budget import RAW_PAGE_TOKENS, estimate_tokens
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+    a an and are as at be by can do does for from has have how if in into is it its of on or
+    that the their then there these this to was were what when where which while who why will
+    with would you your
+'''.split())
+# Standard BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def _stem(term):
+    # Plurals only: enough for 'partitions' to match 'partition'
+    if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+
+def tokenize(text):
+    return [_stem(t) for t in TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def term_counts(text):
+    """
+    The stored form of a page: its term frequencies and length in terms.
+    """
+    terms = tokenize(text)
+    return dict(Counter(terms)), len(terms)
+
+
+def page_tokens(page):
+    return RAW_PAGE_TOKENS if page.sendRaw else estimate_tokens(page.text)
+
+
+class PageIndex:
+    """
+    Inverted index over a set of DocumentPage rows.
+    """
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.postings = defaultdict(list)  # term -> [(page position, term frequency)]
+        for position, page in enumerate(self.pages):
+            for term, frequency in (page.termCounts or {}).items():
+                self.postings[term].append((position, frequency))
+        lengths = [page.termLength for page in self.pages]
+        self.average_length = (sum(lengths) / len(lengths)) if lengths else 0
+
+    def idf(self, term):
+        n = len(self.pages)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=None):
+        """
+        Return [(score, page)] for pages matching the query, best first.
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf(term)
+            for position, frequency in self.postings.get(term, ()):
+                length = self.pages[position].termLength
+                norm = K1 * (1 - B + B * length / self.average_length) if self.average_length else K1
+                scores[position] += idf * frequency * (K1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(score, self.pages[position]) for position, score in ranked[:k]]
+
+
+def select_pages(pages, queries, token_budget, per_query):
+    """
+    Pick pages for the queries within the token budget: the best page of
+    every query first, then the second best of every query, and so on up to
+    ``per_query`` pages each. Pages sent as PDF have no text to match and are
+    added last while the budget allows. Returns the chosen page ids.
+    """
+    index = PageIndex(page for page in pages if not page.sendRaw)
+    rankings = [[page for _, page in index.search(query, per_query)] for query in queries if query.strip()]
+    chosen = set()
+    used = 0
+    candidates = [ranking[rank] for rank in range(per_query) for ranking in rankings if rank < len(ranking)]
+    candidates += [page for page in pages if page.sendRaw]
+    for page in candidates:
+        if page.id in chosen:
+            continue
+        cost = page_tokens(page)
+        if used + cost > token_budget:
+            continue
+        chosen.add(page.id)
+        used += cost
+    return chosen
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedOnCursorPagination(CursorPagination):
+    """
+    Newest first. The cursor holds a createdOn position, so a page boundary
+    stays put while rows are being added; DRF tells rows sharing that
+    timestamp apart by an offset within it, and ``-id`` only makes their
+    order deterministic. Clients follow ``next``/``previous``.
+    """
+    ordering = ('-createdOn', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,126 @@
+"""
+Prompt size estimation and compaction.
+
+Token counts are estimated locally from the text, without a round trip to
+the backend's tokenizer: short words count as one token, longer words and
+numbers as several, punctuation as one each. That tracks the real count
+closely enough to decide whether a request fits its model's budget before
+it is sent.
+"""
+import math
+import os
+import re
+
+from django.conf import settings
+
+# A word, a run of digits, or a single other visible character
+PIECE = re.compile(r'[^\W\d_]+|\d+|[^\w\s]')
+# Characters per token of a long word or a number
+WORD_CHARS_PER_TOKEN = 6
+DIGITS_PER_TOKEN = 3
+# Rough token count of a page sent as PDF (the backend bills a rendered page
+# as an image), and of a stored PDF whose page count is unknown
+RAW_PAGE_TOKENS = 258
+RAW_BYTES_PER_PAGE = 100 * 1024
+
+# Tokens taken by the marker truncate_field puts in place of the cut text
+ELISION_TOKENS = 16
+
+INLINE_SPACE = re.compile(r'(?<=\S)[ \t]{2,}')
+TRAILING_SPACE = re.compile(r'[ \t]+$', re.MULTILINE)
+BLANK_LINES = re.compile(r'\n{3,}')
+
+
+class PromptTooLarge(Exception):
+    """
+    Raised before sending a request that does not fit its model's budget
+    even after compaction.
+    """
+
+
+def estimate_tokens(text):
+    tokens = 0
+    for piece in PIECE.findall(text or ''):
+        if piece.isdigit():
+            tokens += math.ceil(len(piece) / DIGITS_PER_TOKEN)
+        elif piece.isalpha():
+            tokens += math.ceil(len(piece) / WORD_CHARS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+
+def part_tokens(part):
+    """
+    Estimated tokens of an llm.DocumentPart.
+    """
+    if part.text is not None:
+        return estimate_tokens(part.text)
+    if part.pages:
+        return RAW_PAGE_TOKENS * len(part.pages)
+    if part.page_count:
+        return RAW_PAGE_TOKENS * part.page_count
+    if part.path is None:
+        return 0
+    size = os.path.getsize(part.path)
+    if part.mime_type.startswith('text/'):
+        return size // 4
+    return RAW_PAGE_TOKENS * max(1, size // RAW_BYTES_PER_PAGE)
+
+
+def request_tokens(request):
+    """
+    Estimated prompt tokens of an llm.LLMRequest, documents included.
+    """
+    tokens = estimate_tokens(request.system_instruction) + estimate_tokens(request.prompt)
+    tokens += estimate_tokens(request.message)
+    return tokens + sum(part_tokens(part) for part in request.documents)
+
+
+def token_budget(model):
+    return settings.LLM_TOKEN_BUDGETS.get(model, settings.LLM_DEFAULT_TOKEN_BUDGET)
+
+
+def compact_whitespace(text):
+    """
+    Collapse runs of spaces inside lines, trailing spaces and blank lines;
+    leading indentation is kept.
+    """
+    if not text:
+        return text
+    text = TRAILING_SPACE.sub('', text)
+    text = INLINE_SPACE.sub(' ', text)
+    return BLANK_LINES.sub('\n\n', text).strip()
+
+
+def truncate_field(text, max_tokens=None):
+    """
+    Shorten an over-long free-text field to about ``max_tokens`` by keeping
+    its beginning and end, which usually carry the point, and eliding the
+    middle.
+    """
+    max_tokens = settings.LLM_FIELD_MAX_TOKENS if max_tokens is None else max_tokens
+    text = compact_whitespace(text)
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    # Scale the character cut by this text's own characters per token,
+    # leaving room for the marker
+    keep = int(len(text) * max(max_tokens - ELISION_TOKENS, 0) / estimate_tokens(text)) // 2
+    if keep <= 0:
+        # No room for any of the text next to the marker
+        return f"[... {len(text)} characters omitted ...]"
+    head = text[:keep].rsplit(' ', 1)[0]
+    tail = text[-keep:].split(' ', 1)[-1]
+    return f"{head} [... {len(text) - len(head) - len(tail)} characters omitted ...] {tail}"
+
+
+def compact_request(request):
+    """
+    Compact the whitespace of every text in the request in place.
+    """
+    request.system_instruction = compact_whitespace(request.system_instruction)
+    request.prompt = compact_whitespace(request.prompt)
+    request.message = compact_whitespace(request.message)
+    for part in request.documents:
+        if part.text is not None:
+            part.text = compact_whitespace(part.text)
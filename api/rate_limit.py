@@ -0,0 +1,189 @@
+"""
+Cluster-wide rate limiting of LLM calls.
+
+Every worker draws from the same two token buckets per model in Redis: one
+refilled at the model's requests per minute, one at its tokens per minute
+(prompt tokens as estimated by api.prompt_budget). A call proceeds once both
+buckets hold enough; the check and the draw happen in one Lua script, so
+concurrent workers never overdraw. A 429 from the backend pauses the model
+for every worker. Callers wait briefly for capacity and otherwise raise
+RateLimited, which the tasks turn into a retry with that ETA.
+"""
+import logging
+import random
+import re
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# KEYS: request bucket, token bucket, pause key
+# ARGV: requests per minute, tokens per minute, tokens of this call
+# Returns 0 when the call may proceed (and draws from both buckets),
+# otherwise the milliseconds until it could.
+ACQUIRE_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[3])
+if pause > 0 then
+    return pause
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local costs = {1, tonumber(ARGV[3])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+    local capacity = tonumber(ARGV[i])
+    if capacity > 0 then
+        local rate = capacity / 60000
+        local state = redis.call('HMGET', KEYS[i], 'level', 'updated')
+        local level = tonumber(state[1]) or capacity
+        local updated = tonumber(state[2]) or now
+        level = math.min(capacity, level + math.max(0, now - updated) * rate)
+        -- A call larger than the whole bucket goes through on a full bucket
+        local cost = math.min(costs[i], capacity)
+        if level < cost then
+            wait = math.max(wait, math.ceil((cost - level) / rate))
+        end
+        levels[i] = {level - cost, capacity / rate}
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, state in pairs(levels) do
+    redis.call('HSET', KEYS[i], 'level', state[1], 'updated', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(state[2]))
+end
+return 0
+"""
+
+_client = None
+_script = None
+_client_lock = threading.Lock()
+# After Redis fails, let calls through unthrottled for a while instead of
+# paying a connection attempt (and a log line) for every call.
+RETRY_AFTER = 30
+_paused_until = 0.0
+
+RETRY_DELAY = re.compile(r'^(\d+(?:\.\d+)?)s$')
+
+
+class RateLimited(Exception):
+    """
+    Raised when a call would have to wait longer than the caller allows;
+    ``retry_after`` is the wait in seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _redis():
+    global _client, _script
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    settings.LLM_RATE_LIMIT_REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+                _script = _client.register_script(ACQUIRE_SCRIPT)
+    return _client
+
+
+def _keys(model):
+    # One hash tag, so the script's keys share a slot on Redis Cluster
+    prefix = f'llm-rate:{{{model}}}'
+    return [f'{prefix}:requests', f'{prefix}:tokens', f'{prefix}:pause']
+
+
+def limits(model):
+    """
+    (requests per minute, tokens per minute) of a model; 0 is unlimited.
+    """
+    limit = settings.LLM_RATE_LIMITS.get(model, settings.LLM_DEFAULT_RATE_LIMIT)
+    return limit.get('rpm', 0), limit.get('tpm', 0)
+
+
+def acquire(model, tokens):
+    """
+    Draw one request and ``tokens`` tokens from the model's buckets if both
+    have enough. Returns 0 on success, otherwise the seconds to wait.
+    Without Redis, calls are not limited.
+    """
+    global _paused_until
+    rpm, tpm = limits(model)
+    if not settings.LLM_RATE_LIMIT_ENABLED or not (rpm or tpm) or time.monotonic() < _paused_until:
+        return 0
+    try:
+        _redis()
+        wait_ms = _script(keys=_keys(model), args=[rpm, tpm, tokens])
+    except redis.RedisError as e:
+        metrics.incr('llm.rate_limit.unavailable')
+        _paused_until = time.monotonic() + RETRY_AFTER
+        logger.warning('Rate limiter unavailable, not limiting LLM calls for %ss: %s', RETRY_AFTER, e)
+        return 0
+    return wait_ms / 1000
+
+
+def throttle(model, tokens, max_wait=None):
+    """
+    Wait until the model has capacity for a call of ``tokens`` estimated
+    tokens. Raises RateLimited if that takes longer than ``max_wait`` seconds.
+    """
+    max_wait = settings.LLM_RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+    start = time.monotonic()
+    while True:
+        wait = acquire(model, tokens)
+        waited = time.monotonic() - start
+        if not wait:
+            break
+        if waited + wait > max_wait:
+            metrics.observe('llm.rate_limit.wait', waited)
+            metrics.incr('llm.rate_limit.deferred')
+            # Spread the retries of calls deferred together
+            retry_after = wait * (1 + random.random() / 2)
+            raise RateLimited(f'{model} is rate limited for another {wait:.1f}s', retry_after)
+        time.sleep(wait)
+    metrics.observe('llm.rate_limit.wait', waited)
+    if waited:
+        metrics.incr('llm.rate_limit.throttled')
+
+
+def retry_delay(error):
+    """
+    The retry delay a 429 response asks for, or None.
+    """
+    details = getattr(error, 'details', None)
+    if not isinstance(details, dict):
+        return None
+    for detail in details.get('error', {}).get('details', []) or []:
+        match = RETRY_DELAY.match(str(detail.get('retryDelay', '')))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_rate_limit_error(error):
+    return getattr(error, 'code', None) == 429
+
+
+def backend_rate_limited(model, error):
+    """
+    Handle a 429 from the backend: pause the model for every worker and
+    return the RateLimited to raise in its place.
+    """
+    global _paused_until
+    delay = retry_delay(error) or settings.LLM_RATE_LIMIT_BACKOFF
+    metrics.incr('llm.rate_limit.backend_429')
+    if settings.LLM_RATE_LIMIT_ENABLED and time.monotonic() >= _paused_until:
+        try:
+            _redis().set(_keys(model)[2], 1, px=int(delay * 1000), nx=True)
+        except redis.RedisError as e:
+            _paused_until = time.monotonic() + RETRY_AFTER
+            logger.warning('Rate limiter unavailable, could not pause %s: %s', model, e)
+    return RateLimited(f'{model} returned 429: {error}', delay * (1 + random.random() / 2))
@@ -0,0 +1,102 @@
+"""
+Retries of failed LLM work.
+
+Every call carries a deadline (``LLM_CALL_DEADLINES``). When a task's call
+fails, the failure is classified:
+
+- rate limited (api.rate_limit): re-queued for when capacity is expected;
+- transient (deadline passed, connection dropped, 408 or 5xx response,
+  backend overloaded): re-queued after a jittered exponential backoff;
+- anything else (other 4xx, prompt over budget, unparseable response):
+  failed at once, since a retry would fail the same way.
+
+Retries go through Celery (``task.retry``), so no worker sits out the
+backoff. The retry count and the final outcome of question generation and
+evaluation are stored on the review, with the last error.
+"""
+import logging
+import random
+
+import httpx
+from django.conf import settings
+from django.utils import timezone
+from google.genai import errors as genai_errors
+
+from . import evaluation_cache, metrics
+from .llm import TransientLLMError
+from .models import DesignReview
+from .rate_limit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = 'rate_limited'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Kept of the last error's message on the review
+ERROR_MAX_CHARS = 1000
+
+
+def classify(error):
+    if isinstance(error, RateLimited):
+        return RATE_LIMITED
+    if isinstance(error, (TransientLLMError, httpx.TimeoutException, httpx.TransportError,
+                          TimeoutError, ConnectionError)):
+        return TRANSIENT
+    if isinstance(error, genai_errors.APIError) and (error.code == 408 or error.code >= 500):
+        return TRANSIENT
+    return PERMANENT
+
+
+def backoff(retries):
+    """
+    Seconds to wait before retry number ``retries + 1``: doubling from
+    LLM_RETRY_BACKOFF_BASE up to LLM_RETRY_BACKOFF_MAX, of which a random
+    half is taken so retries of calls that failed together spread out.
+    """
+    ceiling = min(settings.LLM_RETRY_BACKOFF_MAX, settings.LLM_RETRY_BACKOFF_BASE * 2 ** retries)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+def deadline(purpose):
+    return settings.LLM_CALL_DEADLINES.get(purpose, settings.LLM_DEFAULT_CALL_DEADLINE)
+
+
+def record_outcome(design_review_id, phase, outcome, retries, error=None):
+    """
+    Store the retries and outcome of a review's 'generation' or
+    'evaluation' phase.
+    """
+    fields = {f'{phase}Outcome': outcome, f'{phase}Retries': retries, 'updatedOn': timezone.now()}
+    if error is not None:
+        fields['lastError'] = f'{type(error).__name__}: {error}'[:ERROR_MAX_CHARS]
+    DesignReview.objects.filter(id=design_review_id).update(**fields)
+    evaluation_cache.invalidate_after_write(design_review_id)
+    metrics.incr(f'llm.{phase}.{outcome}')
+
+
+def retry_or_fail(task, design_review_id, phase, error):
+    """
+    Re-queue a task whose LLM call was rate limited or failed transiently,
+    while it has retries left: records the retry on the review and raises
+    Celery's Retry. Otherwise records the failure and returns.
+    """
+    kind = classify(error)
+    retries = task.request.retries
+    if kind == RATE_LIMITED:
+        countdown, max_retries = error.retry_after, settings.LLM_RATE_LIMIT_MAX_RETRIES
+    elif kind == TRANSIENT:
+        countdown, max_retries = backoff(retries), settings.LLM_RETRY_MAX_RETRIES
+    else:
+        countdown, max_retries = None, 0
+    if retries < max_retries:
+        logger.info('Retrying %s of design review %s in %.1fs (%s, retry %s of %s): %s',
+                    phase, design_review_id, countdown, kind, retries + 1, max_retries, error)
+        metrics.incr(f'llm.retry.{kind}')
+        record_outcome(design_review_id, phase, 'retrying', retries + 1, error)
+        # Back to the task's own queue, even from the interactive lane
+        route = settings.CELERY_TASK_ROUTES.get(task.name, {})
+        raise task.retry(countdown=countdown, max_retries=max_retries, **route)
+    logger.warning('%s of design review %s failed (%s) after %s retries: %s',
+                   phase.capitalize(), design_review_id, kind, retries, error)
+    record_outcome(design_review_id, phase, 'failed', retries, error)
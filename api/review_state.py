@@ -0,0 +1,151 @@
+"""
+Design review status transitions.
+
+Every transition is a single conditional UPDATE (``WHERE status IN ...``), so
+when several requests or workers race for the same transition exactly one of
+them changes the row and the others see zero rows updated. Only the winner
+enqueues work or publishes the new status.
+
+    Pending -> Questions Generated -> In Progress -> Evaluating -> Reviewed
+
+Question generation or an evaluation that fails for good (api.retries) moves
+the review to Failed, so clients waiting on it stop.
+
+The evaluation task id is stored on the review when it moves to Evaluating.
+The task only writes its result while the review still carries its id, so a
+duplicate or cancelled task finishes without touching the review.
+"""
+import logging
+import uuid
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import evaluation_cache, events
+from .models import DesignReview
+
+logger = logging.getLogger(__name__)
+
+# Statuses from which an evaluation may be requested. 'Reviewed' allows a
+# re-evaluation after answers were edited, 'Failed' one after a failed
+# evaluation (a review whose generation failed has no questions to evaluate).
+EVALUABLE_STATUSES = ('Questions Generated', 'In Progress', 'Reviewed', 'Failed')
+
+
+def _publish(design_review_id, status):
+    events.publish(design_review_id, 'status', {'design_review_id': design_review_id, 'status': status})
+
+
+def count_questions(design_review_id, total=0, answered=0):
+    """
+    Adjust the review's question counters in place; concurrent adjustments
+    add up because the arithmetic happens in the UPDATE itself.
+    """
+    DesignReview.objects.filter(id=design_review_id).update(
+        questionsTotal=Greatest(F('questionsTotal') + total, 0),
+        questionsAnswered=Greatest(F('questionsAnswered') + answered, 0),
+    )
+
+
+def is_fully_answered(design_review_id):
+    """
+    Single-row completeness check: at least one question and all answered.
+    """
+    return DesignReview.objects.filter(
+        id=design_review_id, questionsTotal__gt=0, questionsAnswered__gte=F('questionsTotal')).exists()
+
+
+def transition(design_review_id, from_statuses, to_status, **fields):
+    """
+    Move the review to ``to_status`` if it is currently in one of
+    ``from_statuses``. Returns True if this call made the change; the new
+    status is published once the surrounding transaction commits.
+    """
+    updated = DesignReview.objects.filter(id=design_review_id, status__in=from_statuses).update(
+        status=to_status, updatedOn=timezone.now(), **fields)
+    if updated:
+        evaluation_cache.invalidate_after_write(design_review_id)
+        transaction.on_commit(lambda: _publish(design_review_id, to_status))
+    return bool(updated)
+
+
+def request_evaluation(design_review_id, from_statuses=EVALUABLE_STATUSES):
+    """
+    Move a fully answered review to Evaluating and enqueue the evaluation
+    task once the transaction commits. Returns the task id, or None if the
+    review is not fully answered or another caller already won.
+    """
+    task_id = str(uuid.uuid4())
+    updated = DesignReview.objects.filter(
+        id=design_review_id,
+        status__in=from_statuses,
+        questionsTotal__gt=0,
+        questionsAnswered__gte=F('questionsTotal'),
+    ).update(status='Evaluating', evaluationTaskId=task_id, updatedOn=timezone.now())
+    if not updated:
+        return None
+    evaluation_cache.invalidate_after_write(design_review_id)
+
+    def enqueue():
+        from .tasks import evaluate_design_review_task
+        evaluate_design_review_task.apply_async(args=[design_review_id], task_id=task_id)
+        _publish(design_review_id, 'Evaluating')
+
+    transaction.on_commit(enqueue)
+    logger.info('Evaluation %s requested for design review %s', task_id, design_review_id)
+    return task_id
+
+
+def finish_evaluation(design_review_id, task_id, **fields):
+    """
+    Mark the review Reviewed if ``task_id`` still owns its evaluation. A
+    task run outside the queue (no task id) finishes unconditionally.
+    """
+    reviews = DesignReview.objects.filter(id=design_review_id)
+    if task_id is not None:
+        reviews = reviews.filter(status='Evaluating', evaluationTaskId=task_id)
+    updated = reviews.update(status='Reviewed', evaluationTaskId=None, updatedOn=timezone.now(), **fields)
+    if updated:
+        # The task publishes 'Reviewed' itself, after the score
+        evaluation_cache.invalidate_after_write(design_review_id)
+    return bool(updated)
+
+
+def release_evaluation(design_review_id, task_id, to_status='In Progress'):
+    """
+    Hand a cancelled evaluation back to In Progress, or a failed one over to
+    ``to_status`` ('Failed'); either can be requested again.
+    """
+    reviews = DesignReview.objects.filter(id=design_review_id, status='Evaluating')
+    if task_id is not None:
+        reviews = reviews.filter(evaluationTaskId=task_id)
+    updated = reviews.update(status=to_status, evaluationTaskId=None, updatedOn=timezone.now())
+    if updated:
+        evaluation_cache.invalidate_after_write(design_review_id)
+        transaction.on_commit(lambda: _publish(design_review_id, to_status))
+    return bool(updated)
+
+
+def cancel_evaluation(design_review_id):
+    """
+    Cancel a pending or running evaluation: the review goes back to In
+    Progress and the queued task is revoked. Returns the cancelled task id.
+    """
+    task_id = DesignReview.objects.filter(id=design_review_id, status='Evaluating') \
+        .values_list('evaluationTaskId', flat=True).first()
+    if task_id is None or not release_evaluation(design_review_id, task_id):
+        return None
+
+    def revoke():
+        from celery import current_app
+        try:
+            current_app.control.revoke(task_id)
+        except Exception:
+            # The stored id no longer matches, so a task that still runs
+            # discards its result anyway.
+            logger.warning('Could not revoke evaluation task %s', task_id, exc_info=True)
+
+    transaction.on_commit(revoke)
+    return task_id
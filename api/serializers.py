@@ -2,12 +2,112 @@ from rest_framework import serializers
 from .models import Candidate, DesignReview, DesignDocument, ProbingQuestions, DesignReviewScore
 from django.conf import settings
 
-class DesignDocumentSerializer(serializers.ModelSerializer):
+def nested_serializer(field):
+    """
+    The serializer rendered by a nested field (the child of a many=True
+    field), or None for a plain field.
+    """
+    nested = field.child if isinstance(field, serializers.ListSerializer) else field
+    return nested if isinstance(nested, serializers.BaseSerializer) else None
+
+class EagerLoadingMixin:
+    """
+    Lets a view load everything a serializer renders up front. Nested
+    serializer fields are followed automatically, and fields removed from
+    the instance (see SparseFieldsetMixin) are not loaded; relations rendered
+    some other way (e.g. a method field) go in ``select_related_fields`` or
+    ``prefetch_related_fields``.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def eager_loading_lookups(self, prefix='', prefetch_only=False):
+        """
+        Return (select_related, prefetch_related) lookups for this serializer,
+        prefixed for use from a parent queryset. Below a prefetched relation
+        everything has to be prefetched too.
+        """
+        select = [] if prefetch_only else [prefix + f for f in self.select_related_fields]
+        prefetch = [prefix + f for f in self.prefetch_related_fields]
+        if prefetch_only:
+            prefetch += [prefix + f for f in self.select_related_fields]
+        for name, field in self.fields.items():
+            nested = nested_serializer(field)
+            if not isinstance(nested, EagerLoadingMixin):
+                continue
+            many = isinstance(field, serializers.ListSerializer)
+            lookup = prefix + field.source
+            (prefetch if many or prefetch_only else select).append(lookup)
+            nested_select, nested_prefetch = nested.eager_loading_lookups(
+                lookup + '__', prefetch_only=many or prefetch_only)
+            select += nested_select
+            prefetch += nested_prefetch
+        return select, prefetch
+
+    def setup_eager_loading(self, queryset):
+        select, prefetch = self.eager_loading_lookups()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+def parse_field_paths(value):
+    """
+    Turn 'id,status,scores.overallscore' into
+    {'id': {}, 'status': {}, 'scores': {'overallscore': {}}}. None stays None.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, path.strip().split('.')):
+            node = node.setdefault(part, {})
+    return tree
+
+class SparseFieldsetMixin:
+    """
+    Accepts ``fields`` and ``expand`` (comma separated, dotted for nested
+    serializers, as parsed by parse_field_paths):
+
+    - ``fields=id,status,scores.overallscore`` renders only those fields.
+    - ``expand=scores`` renders only the nested relations it names; nested
+      relations not named in ``fields`` or ``expand`` are dropped. Without
+      ``expand`` every nested relation is rendered, as before.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = parse_field_paths(fields) if isinstance(fields, str) else fields
+        self.sparse_expand = parse_field_paths(expand) if isinstance(expand, str) else expand
+        if self.sparse_fields is not None or self.sparse_expand is not None:
+            self._prune(self, self.sparse_fields, self.sparse_expand, '')
+
+    @classmethod
+    def _prune(cls, serializer, fields, expand, path):
+        unknown = set(fields or ()) - set(serializer.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {'fields': f"Unknown field(s): {', '.join(sorted(path + name for name in unknown))}"})
+        for name, field in list(serializer.fields.items()):
+            nested = nested_serializer(field)
+            if fields and name not in fields:
+                serializer.fields.pop(name)
+            elif nested is not None:
+                if expand is not None and name not in expand and not (fields and name in fields):
+                    serializer.fields.pop(name)
+                    continue
+                cls._prune(nested, (fields or {}).get(name) or None,
+                           None if expand is None else expand.get(name, {}), f'{path}{name}.')
+
+class DesignDocumentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    digest = serializers.CharField(source='blob_id', read_only=True)
 
     class Meta:
         model = DesignDocument
-        fields = ['id', 'isProcessed', 'url', 'type', 'size', 'createdOn', 'updatedOn']
+        fields = ['id', 'isProcessed', 'url', 'name', 'digest', 'type', 'size', 'createdOn', 'updatedOn']
 
     def get_url(self, obj):
         request = self.context.get('request')
@@ -18,7 +118,7 @@ class DesignDocumentSerializer(serializers.ModelSerializer):
             return url
         return None
 
-class ProbingQuestionsSerializer(serializers.ModelSerializer):
+class ProbingQuestionsSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = ProbingQuestions
         fields = ['id', 'question', 'answer', 'difficulty', 'createdOn', 'updatedOn']
@@ -33,12 +133,12 @@ class AnswerProbingQuestionsSerializer(serializers.Serializer):
 class SingleQuestionAnswerSerializer(serializers.Serializer):
     answer = serializers.CharField(max_length=5000, allow_blank=True, required=False)
 
-class DesignReviewScoreSerializer(serializers.ModelSerializer):
+class DesignReviewScoreSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = DesignReviewScore
         fields = ['id', 'overallscore', 'status', 'reviewedOn', 'technicalDepth', 'systemDesign', 'tradeoff', 'ownership', 'feedbackSummary', 'createdOn', 'updatedOn']
 
-class DesignReviewSerializer(serializers.ModelSerializer):
+class DesignReviewSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
     documents = DesignDocumentSerializer(many=True, read_only=True)
     probing_questions = ProbingQuestionsSerializer(many=True, read_only=True)
     scores = DesignReviewScoreSerializer(many=True, read_only=True)
@@ -48,10 +148,24 @@ class DesignReviewSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'problemDescription', 'proposedArchitecture', 'designTradeoffs', 'scalibilty',
             'securityMeasures', 'maintainability', 'candidate', 'status', 'submissionDate',
-            'overallScore', 'createdOn', 'updatedOn', 'documents', 'probing_questions', 'scores'
+            'overallScore', 'evaluationTaskId', 'questionsTotal', 'questionsAnswered',
+            'generationRetries', 'generationOutcome', 'evaluationRetries', 'evaluationOutcome', 'lastError',
+            'createdOn', 'updatedOn', 'documents', 'probing_questions', 'scores'
+        ]
+        read_only_fields = [
+            'evaluationTaskId', 'questionsTotal', 'questionsAnswered',
+            'generationRetries', 'generationOutcome', 'evaluationRetries', 'evaluationOutcome', 'lastError',
         ]
 
-class CandidateSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        # Save only what the client sent, so counters and transitions written
+        # by other requests meanwhile are not overwritten with stale values
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data) + ['updatedOn'])
+        return instance
+
+class CandidateSerializer(SparseFieldsetMixin, EagerLoadingMixin, serializers.ModelSerializer):
     design_reviews = DesignReviewSerializer(many=True, read_only=True)
 
     class Meta:
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Candidate, DesignDocument, DesignReview, DesignReviewScore, ProbingQuestions
+from . import blob_store, evaluation_cache, review_state
+
+
+@receiver(post_delete, sender=DesignDocument)
+def release_document_blob(sender, instance, **kwargs):
+    """
+    Give back the document's reference on its content blob.
+    """
+    if instance.blob_id:
+        blob_store.release(instance.blob_id)
+
+
+# Answers are counted by the answer endpoints, which know whether an answer
+# is a question's first one.
+@receiver(post_save, sender=ProbingQuestions)
+def question_created(sender, instance, created, **kwargs):
+    if created:
+        review_state.count_questions(instance.designReview_id, total=1, answered=int(instance.answer is not None))
+
+
+@receiver(post_delete, sender=ProbingQuestions)
+def question_deleted(sender, instance, **kwargs):
+    review_state.count_questions(instance.designReview_id, total=-1, answered=-int(instance.answer is not None))
+
+
+# Cached evaluation payloads (api/evaluation_cache.py) render the review, its
+# score and its candidate. Status transitions done with .update() invalidate
+# in api/review_state.py.
+@receiver(post_save, sender=DesignReview)
+@receiver(post_delete, sender=DesignReview)
+def design_review_changed(sender, instance, **kwargs):
+    evaluation_cache.invalidate_after_write(instance.id)
+
+
+@receiver(post_save, sender=DesignReviewScore)
+@receiver(post_delete, sender=DesignReviewScore)
+def score_changed(sender, instance, **kwargs):
+    evaluation_cache.invalidate_after_write(instance.designReview_id)
+
+
+@receiver(post_save, sender=Candidate)
+def candidate_changed(sender, instance, created, **kwargs):
+    if not created:
+        evaluation_cache.invalidate_after_write(*instance.design_reviews.values_list('id', flat=True))
@@ -1,3 +1,1584 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import pypdf
+from asgiref.sync import async_to_sync
+from celery.exceptions import Retry
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone
+from google.genai import errors as genai_errors
+
+from django.core.cache import cache
+from django.db import connection
+
+from . import async_llm, blob_store, context_cache, extraction, page_index, prompt_budget, evaluation_cache, events, gemini_client, llm, memo, metrics, rate_limit, retries, review_state, tasks, views
+from .gemini_models import EvaluationResponse, QuestionsResponse
+from .serializers import CandidateSerializer
+from .models import (
+    Candidate, DesignDocument, DesignReview, DesignReviewScore, DocumentBlob, DocumentPage, LLMCall, ProbingQuestions,
+)
+from .tasks import evaluate_design_review_task, generate_probing_questions_for_review
+from .upload_handlers import BlobUploadHandler, PageCounter, sniff_file
+
+# For tests that go through the shared cache or the LLM tasks: an in-process
+# cache and no cluster-wide rate limits, so they run without Redis
+without_redis = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    LLM_RATE_LIMIT_ENABLED=False,
+)
+
+
+class MediaRootMixin:
+    """
+    Point MEDIA_ROOT at a throwaway directory for the duration of a test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+
+
+def review_form(candidate, **extra):
+    data = {
+        'problemDescription': 'Design a URL shortener',
+        'proposedArchitecture': 'Stateless API over a KV store',
+        'designTradeoffs': 'Latency over consistency',
+        'scalibilty': 'Horizontal',
+        'securityMeasures': 'Rate limiting',
+        'maintainability': 'Small services',
+        'candidate': candidate.id,
+    }
+    data.update(extra)
+    return data
+
+
+def make_pdf(pages):
+    """
+    A minimal PDF with one page per entry: text is drawn as a string, and
+    pages given as None show a small image instead.
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+               b'<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray '
+               b'/BitsPerComponent 8 /Length 1 >>\nstream\n\x80\nendstream']
+    kids = []
+    for text in pages:
+        if text is None:
+            content, resources = b'q 100 0 0 100 0 0 cm /Im1 Do Q', b'/XObject << /Im1 4 0 R >>'
+        else:
+            content, resources = b'BT /F1 12 Tf 72 720 Td (' + text.encode('latin-1') + b') Tj ET', b'/Font << /F1 3 0 R >>'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+                       b'/Resources << %s >> >>' % (len(objects), resources))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return out
+
+
+def sniff_file_bytes(content):
+    with tempfile.NamedTemporaryFile() as fh:
+        fh.write(content)
+        fh.flush()
+        return sniff_file(fh.name)
+
+
+class BlobStoreTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        patcher = mock.patch('api.views.ingest_review')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, *files):
+        response = self.client.post('/api/design-review/', review_form(self.candidate, files=list(files)))
+        self.assertEqual(response.status_code, 201, response.content)
+        return DesignReview.objects.get(id=response.json()['id'])
+
+    def test_a_new_review_is_ingested_on_the_interactive_lane(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            review = self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 design'))
+        self.enqueue.assert_called_once_with(review.id, queue='interactive')
+
+    def test_identical_uploads_share_one_blob(self):
+        self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 same bytes'))
+        self.upload(SimpleUploadedFile('copy.pdf', b'%PDF-1.4 same bytes'))
+
+        self.assertEqual(DocumentBlob.objects.count(), 1)
+        blob = DocumentBlob.objects.get()
+        self.assertEqual(blob.refCount, 2)
+        self.assertEqual(DesignDocument.objects.filter(blob=blob).count(), 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, blob.path)))
+
+    def test_same_name_different_content_does_not_overwrite(self):
+        first = self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 first'))
+        second = self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 second'))
+
+        first_doc, second_doc = first.documents.get(), second.documents.get()
+        self.assertNotEqual(first_doc.path, second_doc.path)
+        with open(os.path.join(self.media_root, first_doc.path), 'rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 first')
+        with open(os.path.join(self.media_root, second_doc.path), 'rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 second')
+
+    def test_deleting_reviews_releases_blob_and_file_with_last_reference(self):
+        first = self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 shared'))
+        second = self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 shared'))
+        blob = DocumentBlob.objects.get()
+        full_path = os.path.join(self.media_root, blob.path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refCount, 1)
+        self.assertTrue(os.path.isfile(full_path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(os.path.exists(full_path))
+
+    def test_failed_document_insert_takes_no_reference(self):
+        with mock.patch('api.views.DesignDocument.objects.create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/design-review/', review_form(
+                    self.candidate, files=[SimpleUploadedFile('design.pdf', b'%PDF-1.4 orphan')]))
+
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertFalse(DesignReview.objects.exists())
+        blob_dir = os.path.join(self.media_root, blob_store.BLOB_DIR)
+        self.assertEqual([f for _, _, files in os.walk(blob_dir) for f in files], [])
+
+    def test_uploads_are_spooled_before_the_transaction_opens(self):
+        depths = {}
+        spool, create = BlobUploadHandler.receive_data_chunk, DesignDocument.objects.create
+
+        def record(name, func):
+            def wrapper(*args, **kwargs):
+                depths[name] = len(connection.atomic_blocks)
+                return func(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(BlobUploadHandler, 'receive_data_chunk', record('spool', spool)), \
+                mock.patch('api.views.DesignDocument.objects.create', record('create', create)):
+            self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 spooled early'))
+        self.assertLess(depths['spool'], depths['create'])
+
+    def test_prepared_known_content_is_not_spooled_again(self):
+        self.upload(SimpleUploadedFile('design.pdf', b'%PDF-1.4 known'))
+        prepared = blob_store.prepare_upload(SimpleUploadedFile('again.pdf', b'%PDF-1.4 known'))
+        self.assertIsNone(prepared[2])
+
+    def blob_dir_files(self):
+        blob_dir = os.path.join(self.media_root, blob_store.BLOB_DIR)
+        return [f for _, _, files in os.walk(blob_dir) for f in files]
+
+    def test_upload_is_sniffed_and_page_counted(self):
+        content = b'%PDF-1.4\n1 0 obj << /Type /Pages /Count 2 >>\n2 0 obj << /Type /Page >>\n3 0 obj << /Type/Page >>'
+        review = self.upload(SimpleUploadedFile('design.pdf', content, content_type='application/octet-stream'))
+
+        blob = review.documents.get().blob
+        self.assertEqual(blob.digest, hashlib.sha256(content).hexdigest())
+        self.assertEqual((blob.mimeType, blob.pageCount, blob.size), ('application/pdf', 2, len(content)))
+        self.assertEqual(self.blob_dir_files(), [os.path.basename(blob.path)])
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=64)
+    def test_oversized_file_is_rejected_while_streaming(self):
+        response = self.client.post('/api/design-review/', review_form(
+            self.candidate, files=[SimpleUploadedFile('design.pdf', b'%PDF-1.4 ' + b'x' * 100)]))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(DesignReview.objects.exists())
+        self.assertEqual(self.blob_dir_files(), [])
+
+    @override_settings(UPLOAD_MAX_REVIEW_SIZE=100)
+    def test_review_size_limit_spans_files(self):
+        response = self.client.post('/api/design-review/', review_form(self.candidate, files=[
+            SimpleUploadedFile('one.pdf', b'%PDF-1.4 ' + b'1' * 60),
+            SimpleUploadedFile('two.pdf', b'%PDF-1.4 ' + b'2' * 60),
+        ]))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(DocumentBlob.objects.exists())
+        self.assertEqual(self.blob_dir_files(), [])
+
+    def test_unsupported_content_is_rejected(self):
+        response = self.client.post('/api/design-review/', review_form(
+            self.candidate, files=[SimpleUploadedFile('design.pdf', b'PK\x03\x04 zipped')]))
+
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.blob_dir_files(), [])
+
+    def test_page_markers_split_across_chunks_are_counted_once(self):
+        data = b'<< /Type /Page >> ' * 20 + b'<< /Type /Pages >>'
+        for size in (1, 5, 7, 64):
+            counter = PageCounter()
+            for i in range(0, len(data), size):
+                counter.feed(data[i:i + size])
+            self.assertEqual(counter.pages, 20, size)
+
+    def test_document_digest_hashes_legacy_documents_without_blob(self):
+        review = DesignReview.objects.create(candidate=self.candidate, **{
+            k: v for k, v in review_form(self.candidate).items() if k != 'candidate'})
+        legacy_path = 'design_documents/legacy.pdf'
+        os.makedirs(os.path.join(self.media_root, 'design_documents'))
+        with open(os.path.join(self.media_root, legacy_path), 'wb') as fh:
+            fh.write(b'%PDF-1.4 legacy')
+        document = DesignDocument.objects.create(path=legacy_path, type='.pdf', size=15, designReview=review)
+
+        upload = SimpleUploadedFile('legacy.pdf', b'%PDF-1.4 legacy')
+        stored = blob_store.store_prepared(upload, blob_store.prepare_upload(upload))
+        self.assertIsNone(document.blob_id)
+        self.assertEqual(blob_store.document_digest(document), stored.digest)
+
+
+class ExtractionTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        self.review = DesignReview.objects.create(candidate=candidate, **{
+            k: v for k, v in review_form(candidate).items() if k != 'candidate'})
+
+    def add_document(self, content, name='design.pdf'):
+        uploaded = SimpleUploadedFile(name, content)
+        mime_type, page_count = sniff_file_bytes(content)
+        digest, size, temp_path = blob_store._spool(uploaded)
+        blob = blob_store.store_spooled(digest, size, temp_path, '.pdf', mime_type=mime_type, page_count=page_count)
+        return DesignDocument.objects.create(
+            path=blob.path, name=name, blob=blob, type='.pdf', size=blob.size, designReview=self.review)
+
+    def test_pages_are_extracted_once_per_content(self):
+        document = self.add_document(make_pdf(['Load balancer in front of the API', None]))
+        self.add_document(make_pdf(['Load balancer in front of the API', None]), name='copy.pdf')
+
+        pdf_pages = mock.Mock(wraps=extraction._pdf_pages)
+        with mock.patch.dict(extraction.EXTRACTORS, {'application/pdf': pdf_pages}):
+            extraction.ensure_extracted(self.review.documents.select_related('blob'))
+        self.assertEqual(pdf_pages.call_count, 1)
+
+        blob = DocumentBlob.objects.get(digest=document.blob_id)
+        self.assertIsNotNone(blob.extractedOn)
+        self.assertEqual(blob.pageCount, 2)
+        pages = list(blob.pages.values_list('pageNumber', 'text', 'imageCount', 'sendRaw'))
+        self.assertEqual(pages, [(1, 'Load balancer in front of the API', 0, False), (2, '', 1, True)])
+
+    def test_extracted_text_is_sent_with_only_image_pages_as_pdf(self):
+        content = make_pdf(['Writes go to the primary', None, 'Reads go to replicas'])
+        document = self.add_document(content)
+        extraction.ensure_extracted([document])
+
+        parts = tasks.document_parts(self.review.documents.select_related('blob').prefetch_related('blob__pages'))
+        text, raw = parts
+        self.assertIn('[Page 1]\nWrites go to the primary', text.text)
+        self.assertIn('[Page 2: attached as PDF]', text.text)
+        self.assertIn('[Page 3]\nReads go to replicas', text.text)
+        self.assertEqual(raw.pages, [2])
+        self.assertEqual(len(pypdf.PdfReader(io.BytesIO(raw.read_bytes())).pages), 1)
+        self.assertLess(text.payload_size(), len(content))
+
+    def test_unparsable_pdf_is_sent_as_is(self):
+        document = self.add_document(b'%PDF-1.4 not really a pdf')
+        extraction.ensure_extracted([document])
+
+        document.blob.refresh_from_db()
+        self.assertIsNotNone(document.blob.extractedOn)
+        self.assertFalse(document.blob.pages.exists())
+        [part] = tasks.document_parts(self.review.documents.select_related('blob'))
+        self.assertIsNone(part.text)
+        self.assertEqual(part.digest, document.blob_id)
+
+    def test_relevant_pages_of_large_documents_are_selected(self):
+        content = make_pdf([
+            'Orders are written to a sharded Postgres cluster keyed by customer.',
+            'Appendix: office seating plan and team lunch schedule.',
+            'Payments retry through an idempotent outbox and Kafka.',
+        ])
+        extraction.ensure_extracted([self.add_document(content)])
+        documents = self.review.documents.select_related('blob').prefetch_related('blob__pages')
+        queries = [self.review.proposedArchitecture, 'How are payments retried? Through the outbox.']
+
+        self.assertIsNone(tasks.relevant_pages(documents, queries, 8000))
+        with override_settings(EVALUATION_PAGES_PER_QUERY=1):
+            selected = tasks.relevant_pages(documents, queries, 15)
+        [part] = tasks.document_parts(documents, selected_pages=selected)
+        self.assertIn('excerpt: pages 3 of 3', part.text)
+        self.assertIn('idempotent outbox', part.text)
+        self.assertNotIn('seating plan', part.text)
+        self.assertTrue(part.digest.endswith(':text:pages=3'))
+
+    def budget_request(self, documents):
+        return llm.LLMRequest(
+            purpose='evaluation', model='test-model', system_instruction='Evaluate.',
+            prompt='Design   review\n\n\n\nof the payments   service.  ', message='Score it.',
+            response_schema=EvaluationResponse, documents=tasks.document_parts(documents), design_review_id=self.review.id,
+        )
+
+    def test_over_budget_request_drops_irrelevant_pages(self):
+        content = make_pdf([
+            'Payments retry through an idempotent outbox and Kafka.',
+            'Appendix: office seating plan and team lunch schedule for every floor of the building.',
+        ])
+        extraction.ensure_extracted([self.add_document(content)])
+        documents = self.review.documents.select_related('blob').prefetch_related('blob__pages')
+        request = self.budget_request(documents)
+        full = prompt_budget.request_tokens(request)
+
+        with override_settings(LLM_TOKEN_BUDGETS={'test-model': full - 5}):
+            tokens = tasks.fit_to_budget(request, documents, ['payments retry'])
+        self.assertLessEqual(tokens, full - 5)
+        self.assertTrue(request.compacted)
+        self.assertEqual(request.prompt, 'Design review\n\nof the payments service.')
+        [part] = request.documents
+        self.assertIn('idempotent outbox', part.text)
+        self.assertNotIn('seating plan', part.text)
+        # A selection of pages is sent inline, not cached as a context of its own
+        with mock.patch.object(context_cache, 'get_or_create') as get_or_create:
+            self.assertIsNone(tasks.shared_context(llm.LocalBackend(), request))
+        get_or_create.assert_not_called()
+
+    def test_request_that_cannot_fit_is_not_sent(self):
+        extraction.ensure_extracted([self.add_document(make_pdf(['Payments retry through an outbox.']))])
+        documents = self.review.documents.select_related('blob').prefetch_related('blob__pages')
+        request = self.budget_request(documents)
+
+        with override_settings(LLM_TOKEN_BUDGETS={'test-model': 5}):
+            with self.assertRaises(prompt_budget.PromptTooLarge):
+                tasks.fit_to_budget(request, documents, ['payments'])
+
+    @override_settings(LLM_SEND_EXTRACTED_TEXT=False)
+    def test_extracted_text_can_be_turned_off(self):
+        document = self.add_document(make_pdf(['Sharded by user id']))
+        extraction.ensure_extracted([document])
+
+        [part] = tasks.document_parts(self.review.documents.select_related('blob'))
+        self.assertIsNone(part.text)
+
+
+class AsyncRunnerTests(SimpleTestCase):
+    def setUp(self):
+        self.runner = async_llm.Runner(concurrency=2)
+        self.addCleanup(self.runner.close)
+
+    def test_calls_beyond_the_limit_wait_for_a_slot(self):
+        running = []
+        peak = []
+
+        async def call(i):
+            running.append(i)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.remove(i)
+            return i * 10
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda i: self.runner.run(call(i)), range(6)))
+        self.assertEqual(results, [0, 10, 20, 30, 40, 50])
+        self.assertEqual(max(peak), 2)
+
+    def test_iterate_yields_chunks_and_raises_stream_errors(self):
+        async def chunks(fail):
+            for chunk in ('{"a"', ': 1}'):
+                await asyncio.sleep(0)
+                yield chunk
+            if fail:
+                raise llm.LLMError('stream broke')
+
+        self.assertEqual(list(self.runner.iterate(chunks(False))), ['{"a"', ': 1}'])
+        received = []
+        with self.assertRaises(llm.LLMError):
+            for chunk in self.runner.iterate(chunks(True)):
+                received.append(chunk)
+        self.assertEqual(received, ['{"a"', ': 1}'])
+
+
+def quota_error(retry_delay='17s'):
+    return genai_errors.ClientError(429, {'error': {
+        'code': 429, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED',
+        'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': retry_delay}],
+    }})
+
+
+@override_settings(LLM_RATE_LIMIT_MAX_WAIT=5)
+@without_redis
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_short_waits_are_slept_through(self):
+        with mock.patch('api.rate_limit.acquire', side_effect=[0.2, 0.1, 0]) as acquire, \
+                mock.patch('api.rate_limit.time.sleep') as sleep:
+            rate_limit.throttle('test-model', 120)
+        acquire.assert_called_with('test-model', 120)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.2, 0.1])
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['llm.rate_limit.throttled'], 1)
+        self.assertEqual(snapshot['timings']['llm.rate_limit.wait']['count'], 1)
+
+    def test_long_waits_raise_with_the_time_to_retry(self):
+        with mock.patch('api.rate_limit.acquire', return_value=40), \
+                mock.patch('api.rate_limit.time.sleep') as sleep:
+            with self.assertRaises(rate_limit.RateLimited) as raised:
+                rate_limit.throttle('test-model', 120)
+        sleep.assert_not_called()
+        self.assertGreaterEqual(raised.exception.retry_after, 40)
+        self.assertLessEqual(raised.exception.retry_after, 60)
+        self.assertEqual(metrics.snapshot()['counters']['llm.rate_limit.deferred'], 1)
+
+    @override_settings(LLM_RATE_LIMIT_ENABLED=True, LLM_RATE_LIMIT_REDIS_URL='redis://127.0.0.1:1/0',
+                       LLM_RATE_LIMITS={'test-model': {'rpm': 10, 'tpm': 1000}})
+    def test_calls_are_not_limited_while_redis_is_unavailable(self):
+        self.addCleanup(setattr, rate_limit, '_paused_until', 0.0)
+        self.addCleanup(setattr, rate_limit, '_client', None)
+        rate_limit._client = None
+
+        self.assertEqual(rate_limit.acquire('test-model', 100), 0)
+        self.assertEqual(rate_limit.acquire('test-model', 100), 0)
+        self.assertEqual(metrics.snapshot()['counters']['llm.rate_limit.unavailable'], 1)
+
+    def test_backend_429_asks_for_its_retry_delay(self):
+        error = quota_error('17s')
+        self.assertTrue(rate_limit.is_rate_limit_error(error))
+        self.assertFalse(rate_limit.is_rate_limit_error(genai_errors.ServerError(503, {})))
+        self.assertEqual(rate_limit.retry_delay(error), 17)
+        limited = rate_limit.backend_rate_limited('test-model', error)
+        self.assertTrue(17 <= limited.retry_after <= 25.5)
+        with override_settings(LLM_RATE_LIMIT_BACKOFF=30):
+            self.assertEqual(rate_limit.retry_delay(quota_error('soon')), None)
+            self.assertGreaterEqual(rate_limit.backend_rate_limited('test-model', quota_error('soon')).retry_after, 30)
+
+
+class FakeAsyncBackend(llm.LLMBackend):
+    """
+    Answers call number n after ``delays[n]`` seconds.
+    """
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def agenerate(self, request):
+        self.calls += 1
+        number = self.calls
+        try:
+            await asyncio.sleep(self.delays[number - 1])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f'response {number}'
+
+
+class HedgingTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.runner = async_llm.Runner(concurrency=2)
+        self.addCleanup(self.runner.close)
+
+    def test_a_slow_call_is_hedged_and_the_first_response_wins(self):
+        backend = FakeAsyncBackend(1.0, 0.01)
+        result = self.runner.run(async_llm.hedged(backend, llm_request(QuestionsResponse), 0.05, lambda: True))
+        self.assertEqual(result, 'response 2')
+        self.assertEqual((backend.calls, backend.cancelled), (2, 1))
+        self.assertEqual(metrics.snapshot()['counters']['llm.test.hedge_won'], 1)
+
+    def test_no_hedge_for_fast_calls_or_without_capacity(self):
+        fast = FakeAsyncBackend(0.01)
+        self.assertEqual(self.runner.run(async_llm.hedged(fast, llm_request(QuestionsResponse), 0.5, lambda: True)),
+                         'response 1')
+        slow = FakeAsyncBackend(0.1, 0.01)
+        self.assertEqual(self.runner.run(async_llm.hedged(slow, llm_request(QuestionsResponse), 0.01, lambda: False)),
+                         'response 1')
+        self.assertEqual(fast.calls + slow.calls, 2)
+        self.assertNotIn('llm.test.hedged', metrics.snapshot()['counters'])
+
+    @override_settings(LLM_HEDGE_ENABLED=True, LLM_HEDGE_MIN_SAMPLES=20, LLM_HEDGE_PERCENTILE=95)
+    def test_hedge_delay_is_the_recent_p95_latency(self):
+        for ms in range(1, 20):
+            metrics.observe('llm.test.latency', ms / 1000)
+        self.assertIsNone(async_llm.hedge_delay('test'))
+        metrics.observe('llm.test.latency', 0.5)
+        self.assertEqual(async_llm.hedge_delay('test'), 0.019)
+        with override_settings(LLM_HEDGE_ENABLED=False):
+            self.assertIsNone(async_llm.hedge_delay('test'))
+
+
+class RetryTests(SimpleTestCase):
+    def test_failures_are_classified(self):
+        self.assertEqual(retries.classify(rate_limit.RateLimited('slow down', 5)), retries.RATE_LIMITED)
+        for error in (llm.LLMTimeout('late'), httpx.ConnectError('refused'), genai_errors.ServerError(503, {}),
+                      genai_errors.ClientError(408, {})):
+            self.assertEqual(retries.classify(error), retries.TRANSIENT, error)
+        for error in (genai_errors.ClientError(400, {}), prompt_budget.PromptTooLarge('big'), ValueError('bad json'),
+                      llm.LLMError('unknown context')):
+            self.assertEqual(retries.classify(error), retries.PERMANENT, error)
+
+    @override_settings(LLM_RETRY_BACKOFF_BASE=2, LLM_RETRY_BACKOFF_MAX=60)
+    def test_backoff_doubles_with_jitter_up_to_the_cap(self):
+        for retry, low, high in ((0, 1, 2), (3, 8, 16), (10, 30, 60)):
+            delays = [retries.backoff(retry) for _ in range(50)]
+            self.assertTrue(all(low <= delay <= high for delay in delays), (retry, delays))
+            self.assertGreater(len(set(delays)), 1)
+
+
+class CeleryQueueTests(SimpleTestCase):
+    def test_generation_and_evaluation_have_their_own_queues(self):
+        from dr_reviewer.celery import app
+        route = app.amqp.router.route
+        self.assertEqual(route({}, generate_probing_questions_for_review.name)['queue'].name, 'generation')
+        self.assertEqual(route({}, evaluate_design_review_task.name)['queue'].name, 'evaluation')
+        self.assertTrue(generate_probing_questions_for_review.acks_late)
+        self.assertTrue(evaluate_design_review_task.acks_late)
+
+    def test_worker_pools_are_started_per_queue(self):
+        out = io.StringIO()
+        call_command('start_celery_worker', '--dry-run', stdout=out)
+        commands = {line.split('--hostname ')[1].split('@')[0]: line for line in out.getvalue().splitlines()}
+        self.assertEqual(set(commands), {'generation', 'evaluation', 'default'})
+        self.assertIn('--queues interactive,generation --pool prefork --concurrency 8', commands['generation'])
+        self.assertIn('--queues evaluation', commands['evaluation'])
+        self.assertIn('--prefetch-multiplier 1', commands['evaluation'])
+
+        out = io.StringIO()
+        with override_settings(LLM_EXECUTION='async', LLM_ASYNC_CONCURRENCY=24):
+            call_command('start_celery_worker', '--dry-run', '--pool', 'evaluation', stdout=out)
+        self.assertIn('--pool threads --concurrency 24', out.getvalue())
+
+
+class PromptBudgetTests(SimpleTestCase):
+    def test_estimate_tokens(self):
+        self.assertEqual(prompt_budget.estimate_tokens('Hello, world'), 3)
+        self.assertEqual(prompt_budget.estimate_tokens('internationalization'), 4)
+        self.assertEqual(prompt_budget.estimate_tokens('12345 ms'), 3)
+        self.assertEqual(prompt_budget.estimate_tokens(''), 0)
+
+    def test_compact_whitespace_keeps_indentation(self):
+        text = 'Consider:  \n  - first    point\t\n\n\n\n  - second'
+        self.assertEqual(prompt_budget.compact_whitespace(text), 'Consider:\n  - first point\n\n  - second')
+
+    def test_long_fields_keep_their_beginning_and_end(self):
+        answer = 'We shard by tenant. ' + 'Filler sentence about nothing in particular. ' * 200 + 'Failover is manual.'
+        short = prompt_budget.truncate_field(answer, max_tokens=100)
+
+        self.assertTrue(short.startswith('We shard by tenant.'))
+        self.assertTrue(short.endswith('Failover is manual.'))
+        self.assertIn('characters omitted', short)
+        self.assertLessEqual(prompt_budget.estimate_tokens(short), 100)
+        self.assertEqual(prompt_budget.truncate_field('Short answer.', max_tokens=100), 'Short answer.')
+
+    def test_budget_below_the_marker_leaves_only_the_marker(self):
+        answer = 'Filler sentence about nothing in particular. ' * 20
+        short = prompt_budget.truncate_field(answer, max_tokens=prompt_budget.ELISION_TOKENS - 1)
+        self.assertEqual(short, f'[... {len(answer.strip())} characters omitted ...]')
+        self.assertLess(len(short), len(answer))
+
+
+class PageIndexTests(SimpleTestCase):
+    def pages(self, *texts, raw=()):
+        pages = []
+        for number, text in enumerate(texts, 1):
+            counts, length = page_index.term_counts(text)
+            pages.append(DocumentPage(id=number, pageNumber=number, text=text, termCounts=counts,
+                                      termLength=length, sendRaw=number in raw))
+        return pages
+
+    def test_search_ranks_matching_pages_by_bm25(self):
+        index = page_index.PageIndex(self.pages(
+            'Kafka topics are split into partitions for ordering.',
+            'The cache sits in front of the database.',
+            'Each partition of the topic has one consumer, Kafka keeps offsets.',
+        ))
+        ranked = [page.pageNumber for _, page in index.search('Which consumer reads each Kafka partition?')]
+        self.assertEqual(ranked, [3, 1])
+        self.assertEqual(index.search('nothing relevant here'), [])
+
+    def test_selection_interleaves_queries_within_the_budget(self):
+        pages = self.pages(
+            'Postgres primary with two read replicas.',
+            'Replicas lag behind the primary under load.',
+            'Rate limiting per API key at the gateway.',
+            'The gateway terminates TLS.',
+            '',
+            raw=(5,),
+        )
+        tokens = page_index.page_tokens
+        budget = tokens(pages[0]) + tokens(pages[2]) + tokens(pages[1])
+
+        chosen = page_index.select_pages(pages, ['replicas primary', 'gateway rate limiting'], budget, per_query=2)
+        self.assertEqual(chosen, {1, 2, 3})
+        everything = page_index.select_pages(pages, ['replicas', 'gateway'], 10000, per_query=2)
+        self.assertEqual(everything, {1, 2, 3, 4, 5})
+
+
+@override_settings(
+    GEMINI_API_KEY='test-key',
+    GEMINI_HTTP_MAX_CONNECTIONS=7,
+    GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS=3,
+    GEMINI_HTTP_KEEPALIVE_EXPIRY=42,
+    GEMINI_HTTP_TIMEOUT_MS=1500,
+)
+class GeminiClientPoolTests(SimpleTestCase):
+    def setUp(self):
+        gemini_client._client = None
+        gemini_client._client_pid = None
+        patcher = mock.patch.object(gemini_client.genai, 'Client', side_effect=lambda **kw: mock.Mock(**kw))
+        self.client_cls = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, gemini_client, '_client', None)
+
+    def test_client_is_reused_within_a_process(self):
+        first = gemini_client.get_client()
+        self.assertIs(gemini_client.get_client(), first)
+        self.assertEqual(self.client_cls.call_count, 1)
+
+    def test_client_is_rebuilt_after_fork(self):
+        first = gemini_client.get_client()
+        with mock.patch.object(gemini_client.os, 'getpid', return_value=gemini_client._client_pid + 1):
+            second = gemini_client.get_client()
+        self.assertIsNot(second, first)
+        self.assertEqual(self.client_cls.call_count, 2)
+
+    def test_pool_limits_and_timeout_come_from_settings(self):
+        gemini_client.get_client()
+        kwargs = self.client_cls.call_args.kwargs
+        self.assertEqual(kwargs['api_key'], 'test-key')
+        http_options = kwargs['http_options']
+        self.assertEqual(http_options.timeout, 1500)
+        limits = http_options.client_args['limits']
+        self.assertIsInstance(limits, httpx.Limits)
+        self.assertEqual(limits.max_connections, 7)
+        self.assertEqual(limits.max_keepalive_connections, 3)
+        self.assertEqual(limits.keepalive_expiry, 42)
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_missing_api_key_fails_clearly(self):
+        with self.assertRaises(ImproperlyConfigured):
+            gemini_client.get_client()
+        self.client_cls.assert_not_called()
+
+
+def llm_request(schema, prompt='Design a URL shortener'):
+    return llm.LLMRequest(
+        purpose='test', model='local-model', system_instruction='system', prompt=prompt,
+        message='go', response_schema=schema, documents=[llm.DocumentPart(digest='abc')],
+    )
+
+
+class LocalBackendTests(SimpleTestCase):
+    def test_responses_are_schema_valid(self):
+        backend = llm.LocalBackend(latency='fixed', latency_ms=0)
+        questions = QuestionsResponse.model_validate_json(backend.generate(llm_request(QuestionsResponse)))
+        self.assertTrue(5 <= len(questions.Questions) <= 10)
+        EvaluationResponse.model_validate_json(backend.generate(llm_request(EvaluationResponse)))
+
+    def test_responses_are_deterministic_per_request(self):
+        first = llm.LocalBackend(latency='fixed', latency_ms=0, seed=1)
+        second = llm.LocalBackend(latency='fixed', latency_ms=0, seed=2)
+        request = llm_request(QuestionsResponse)
+        self.assertEqual(first.generate(request), second.generate(request))
+        self.assertNotEqual(first.generate(request), first.generate(llm_request(QuestionsResponse, prompt='other')))
+
+    def test_latency_sequence_is_seeded(self):
+        first = llm.LocalBackend(latency='lognormal', latency_ms=500, seed=3)
+        second = llm.LocalBackend(latency='lognormal', latency_ms=500, seed=3)
+        self.assertEqual([first.sample_latency() for _ in range(5)], [second.sample_latency() for _ in range(5)])
+        uniform = llm.LocalBackend(latency='uniform', latency_low_ms=100, latency_high_ms=200)
+        self.assertTrue(all(0.1 <= uniform.sample_latency() <= 0.2 for _ in range(20)))
+
+    def test_error_rate(self):
+        backend = llm.LocalBackend(latency='fixed', latency_ms=0, error_rate=1.0)
+        with self.assertRaises(llm.TransientLLMError):
+            backend.generate(llm_request(QuestionsResponse))
+
+    def test_calls_past_their_deadline_time_out(self):
+        backend = llm.LocalBackend(latency='fixed', latency_ms=200)
+        request = llm_request(QuestionsResponse)
+        request.timeout = 0.01
+        with self.assertRaises(llm.LLMTimeout):
+            backend.generate(request)
+        with self.assertRaises(llm.LLMTimeout):
+            list(backend.stream(request))
+
+
+@override_settings(LLM_BACKEND='api.llm.LocalBackend', LLM_BACKEND_OPTIONS={'latency': 'fixed', 'latency_ms': 0})
+@without_redis
+class TasksWithLocalBackendTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        llm.reset_backend()
+        self.addCleanup(llm.reset_backend)
+        cache.clear()
+        metrics.reset()
+        tasks.evaluation_memo.clear()
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, **fields)
+        upload = SimpleUploadedFile('design.pdf', b'%PDF-1.4 design')
+        blob = blob_store.store_prepared(upload, blob_store.prepare_upload(upload))
+        DesignDocument.objects.create(path=blob.path, blob=blob, type='.pdf', size=blob.size, designReview=self.review)
+
+    def test_generation_and_evaluation_go_through_the_backend(self):
+        generate_probing_questions_for_review(self.review.id)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'Questions Generated')
+        self.assertGreaterEqual(self.review.probing_questions.count(), 5)
+
+        self.review.probing_questions.update(answer='Because it scales.')
+        result = evaluate_design_review_task(self.review.id)
+        self.assertTrue(result['success'])
+        self.assertTrue(DesignReviewScore.objects.filter(designReview=self.review).exists())
+
+    @override_settings(LLM_EXECUTION='async', LLM_ASYNC_CONCURRENCY=4)
+    def test_async_execution_gives_the_same_results(self):
+        self.addCleanup(async_llm.reset_runner)
+        generate_probing_questions_for_review(self.review.id)
+        self.assertGreaterEqual(self.review.probing_questions.count(), 5)
+
+        self.review.probing_questions.update(answer='Because it scales.')
+        async_result = evaluate_design_review_task(self.review.id)
+        tasks.evaluation_memo.clear()
+        with override_settings(LLM_EXECUTION='sync'):
+            sync_result = evaluate_design_review_task(self.review.id)
+        self.assertTrue(async_result['success'])
+        self.assertEqual(async_result['feedback'], sync_result['feedback'])
+        self.assertEqual(async_result['overall_score'], sync_result['overall_score'])
+
+    def test_rate_limited_generation_is_deferred_instead_of_failing(self):
+        task = generate_probing_questions_for_review
+        with mock.patch('api.rate_limit.acquire', return_value=45), \
+                mock.patch.object(task, 'retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                task(self.review.id)
+        self.assertGreaterEqual(retry.call_args.kwargs['countdown'], 45)
+        self.assertEqual(self.review.probing_questions.count(), 0)
+        # Nothing was sent, so nothing is logged
+        self.assertFalse(LLMCall.objects.filter(designReview=self.review).exists())
+
+        task(self.review.id)
+        self.assertGreaterEqual(self.review.probing_questions.count(), 5)
+
+    def test_backend_429_defers_the_evaluation(self):
+        generate_probing_questions_for_review(self.review.id)
+        self.review.probing_questions.update(answer='Because it scales.')
+        task = evaluate_design_review_task
+        with mock.patch.object(llm.get_backend(), 'generate', side_effect=quota_error('17s')), \
+                mock.patch.object(task, 'retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                task(self.review.id)
+        self.assertGreaterEqual(retry.call_args.kwargs['countdown'], 17)
+        self.assertFalse(DesignReviewScore.objects.filter(designReview=self.review).exists())
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        task = generate_probing_questions_for_review
+        with mock.patch.object(llm.get_backend(), 'stream', side_effect=llm.LLMTimeout('deadline passed')), \
+                mock.patch.object(task, 'retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                task(self.review.id)
+        self.assertTrue(1 <= retry.call_args.kwargs['countdown'] <= 2)
+        self.assertEqual(retry.call_args.kwargs['queue'], 'generation')
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.generationOutcome, self.review.generationRetries), ('retrying', 1))
+        self.assertEqual(self.review.lastError, 'LLMTimeout: deadline passed')
+
+        task(self.review.id)
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.generationOutcome), ('Questions Generated', 'succeeded'))
+
+    def test_documents_are_preprocessed_before_generation_and_failures_left_out(self):
+        from dr_reviewer.celery import app
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        document = self.review.documents.get()
+        missing = DesignDocument.objects.create(
+            path='design_documents/missing.pdf', type='.pdf', size=1, designReview=self.review)
+        tasks.ingest_review(self.review.id).get()
+
+        document.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((document.isProcessed, missing.isProcessed), ('analyzed', 'error'))
+        self.assertIsNotNone(document.blob.extractedOn)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'Questions Generated')
+        self.assertEqual(LLMCall.objects.get(designReview=self.review).documentParts, 1)
+
+        # Ingesting again only retries the failed document
+        with mock.patch('api.tasks.extract_blob') as extract:
+            self.assertEqual(tasks.preprocess_design_document(document.id)['status'], 'skipped')
+            self.assertEqual(tasks.preprocess_design_document(missing.id)['status'], 'error')
+        extract.assert_not_called()
+
+    def test_redelivered_generation_does_not_duplicate_questions(self):
+        generate_probing_questions_for_review(self.review.id)
+        count = self.review.probing_questions.count()
+        self.assertIn('already generated', generate_probing_questions_for_review(self.review.id))
+        self.assertEqual(self.review.probing_questions.count(), count)
+
+    def test_redelivered_generation_keeps_questions_of_the_interrupted_run(self):
+        ProbingQuestions.objects.create(designReview=self.review, question='Why a KV store?', difficulty=3)
+        backend = llm.get_backend()
+        with mock.patch.object(backend, 'stream') as stream:
+            generate_probing_questions_for_review(self.review.id)
+        stream.assert_not_called()
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.questionsTotal), ('Questions Generated', 1))
+
+    def test_permanent_failure_is_recorded_without_retrying(self):
+        task = generate_probing_questions_for_review
+        with mock.patch('api.tasks.fit_to_budget', side_effect=prompt_budget.PromptTooLarge('needs 2M tokens')), \
+                mock.patch.object(task, 'retry') as retry, mock.patch.object(events, 'publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            result = task(self.review.id)
+        self.assertIn('Failed', result)
+        retry.assert_not_called()
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.generationOutcome), ('Failed', 'failed'))
+        self.assertEqual(self.review.lastError, 'PromptTooLarge: needs 2M tokens')
+        publish.assert_called_once_with(self.review.id, 'status', {'design_review_id': self.review.id, 'status': 'Failed'})
+
+        response = self.client.post(f'/api/design-review/{self.review.id}/evaluate/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['last_error'], 'PromptTooLarge: needs 2M tokens')
+
+    def test_calls_are_logged_with_their_estimated_size(self):
+        generate_probing_questions_for_review(self.review.id)
+
+        call = LLMCall.objects.get(designReview=self.review)
+        self.assertEqual((call.purpose, call.model, call.documentParts), ('questions', settings.GEMINI_MODEL, 1))
+        self.assertGreater(call.estimatedTokens, 0)
+        self.assertGreater(call.promptChars, 0)
+        self.assertFalse(call.compacted)
+
+    def test_documents_context_is_created_once_and_shared(self):
+        backend = llm.get_backend()
+        with mock.patch.object(backend, 'create_context', wraps=backend.create_context) as create_context:
+            generate_probing_questions_for_review(self.review.id)
+            self.review.probing_questions.update(answer='Because it scales.')
+            evaluate_design_review_task(self.review.id)
+            self.review.probing_questions.update(answer='Because it scales horizontally.')
+            evaluate_design_review_task(self.review.id)
+
+        create_context.assert_called_once()
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['llm.questions.context_hits'], 1)
+        self.assertEqual(counters['llm.evaluation.context_hits'], 2)
+        self.assertEqual(counters['llm.context_cache.miss'], 1)
+        self.assertEqual(counters['llm.context_cache.hit'], 2)
+
+
+    def test_unchanged_re_evaluation_is_memoized(self):
+        generate_probing_questions_for_review(self.review.id)
+        self.review.probing_questions.update(answer='Because it scales.')
+        backend = llm.get_backend()
+        with mock.patch.object(backend, 'generate', wraps=backend.generate) as generate:
+            first = evaluate_design_review_task(self.review.id)
+            tasks.evaluation_memo.clear()  # a different worker process: only the shared cache
+            second = evaluate_design_review_task(self.review.id)
+            third = evaluate_design_review_task(self.review.id)
+            self.assertEqual(generate.call_count, 1)
+            self.review.probing_questions.update(answer='Because it scales horizontally.')
+            evaluate_design_review_task(self.review.id)
+            self.assertEqual(generate.call_count, 2)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, third)
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['llm.memo.evaluation.hit'], 2)
+        self.assertEqual(counters['llm.memo.evaluation.shared_hit'], 1)
+        self.assertEqual(counters['llm.memo.evaluation.miss'], 2)
+
+
+    def test_streamed_questions_are_saved_one_by_one(self):
+        counts = []
+        original_create = ProbingQuestions.objects.create
+
+        def create(**kwargs):
+            counts.append(ProbingQuestions.objects.filter(designReview=self.review).count())
+            return original_create(**kwargs)
+
+        with mock.patch.object(ProbingQuestions.objects, 'create', side_effect=create):
+            generate_probing_questions_for_review(self.review.id)
+        self.assertEqual(counts, list(range(len(counts))))
+        self.assertGreaterEqual(len(counts), 5)
+
+    def test_stream_failure_after_some_questions_keeps_them(self):
+        text = llm.get_backend().render(llm_request(QuestionsResponse))
+        broken = text[:text.index('},{') + 2]
+
+        def stream(request):
+            yield broken
+            raise llm.LLMError('connection reset')
+
+        with mock.patch.object(llm.get_backend(), 'stream', side_effect=stream), \
+                self.assertLogs('api.tasks', 'WARNING'):
+            generate_probing_questions_for_review(self.review.id)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.probing_questions.count(), 1)
+        self.assertEqual(self.review.status, 'Questions Generated')
+
+    def test_answering_while_questions_stream_does_not_trigger_evaluation(self):
+        ProbingQuestions.objects.create(designReview=self.review, question='First?', difficulty=2)
+        question = self.review.probing_questions.get()
+        with mock.patch('api.tasks.evaluate_design_review_task.apply_async') as delay:
+            response = self.client.post(f'/api/question/{question.id}/answer/', {'answer': 'Sharding.'})
+        self.assertEqual(response.status_code, 200)
+        delay.assert_not_called()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'Pending')
+
+
+@without_redis
+class ContextCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_key_depends_on_digests_and_prompt_version_not_order(self):
+        backend = llm.LocalBackend()
+        a, b = llm.DocumentPart(digest='a'), llm.DocumentPart(digest='b')
+        key = context_cache.context_key(backend, 'm', 'v1', [a, b])
+        self.assertEqual(key, context_cache.context_key(backend, 'm', 'v1', [b, a]))
+        self.assertNotEqual(key, context_cache.context_key(backend, 'm', 'v2', [a, b]))
+        self.assertNotEqual(key, context_cache.context_key(backend, 'm', 'v1', [a]))
+
+    def test_failed_creation_falls_back_to_inline_documents_and_is_remembered(self):
+        backend = mock.Mock(name='backend')
+        backend.name = 'mock'
+        backend.create_context.side_effect = RuntimeError('content too small to cache')
+        documents = [llm.DocumentPart(digest='a')]
+        with self.assertLogs('api.context_cache', 'ERROR'):
+            self.assertIsNone(context_cache.get_or_create(backend, 'm', 'v1', documents))
+        self.assertIsNone(context_cache.get_or_create(backend, 'm', 'v1', documents))
+        backend.create_context.assert_called_once()
+
+    def test_creation_can_be_deferred(self):
+        backend = mock.Mock(name='backend')
+        backend.name = 'mock'
+        backend.create_context.return_value = 'handle'
+        documents = [llm.DocumentPart(digest='a')]
+        deferred = mock.Mock(side_effect=rate_limit.RateLimited('limited', 5))
+        with self.assertRaises(rate_limit.RateLimited):
+            context_cache.get_or_create(backend, 'm', 'v1', documents, before_create=deferred)
+        backend.create_context.assert_not_called()
+
+        # The lock was released, so the next call creates the context
+        allowed = mock.Mock()
+        self.assertEqual(context_cache.get_or_create(backend, 'm', 'v1', documents, before_create=allowed), 'handle')
+        allowed.assert_called_once_with(documents)
+
+
+class MemoTests(SimpleTestCase):
+    def test_lru_evicts_least_recently_used(self):
+        lru = memo.TTLLRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        lru = memo.TTLLRUCache(maxsize=2, ttl=60)
+        with mock.patch.object(memo.time, 'monotonic', return_value=0):
+            lru.set('a', 1)
+        with mock.patch.object(memo.time, 'monotonic', return_value=61):
+            self.assertIsNone(lru.get('a'))
+
+    def test_canonical_key_ignores_whitespace_only_changes(self):
+        self.assertEqual(memo.canonical_key('k', text='a  b\n'), memo.canonical_key('k', text='a b'))
+        self.assertNotEqual(memo.canonical_key('k', text='a b'), memo.canonical_key('k', text='a c'))
+
+
+class StreamingParserTests(SimpleTestCase):
+    def test_items_are_yielded_as_soon_as_they_complete(self):
+        text = QuestionsResponse.model_validate({'Questions': [
+            {'question': 'Why {braces} and "quotes" \\ here?', 'difficulty': 3, 'category': 'Security'},
+            {'question': 'Second]', 'difficulty': 5, 'category': 'Architecture'},
+        ]}).model_dump_json()
+        received = []
+
+        def chunks():
+            for i in range(0, len(text), 7):
+                received.append(i)
+                yield text[i:i + 7]
+
+        items = llm.iter_array_items(chunks(), 'Questions')
+        first = next(items)
+        self.assertEqual(first, text[text.index('[') + 1:text.index('},{') + 1])
+        # The first item is available before the stream has finished.
+        self.assertLess(received[-1] + 7, len(text))
+        second = next(items)
+        self.assertEqual([q.question for q in map(tasks.Question.model_validate_json, [first, second])],
+                         ['Why {braces} and "quotes" \\ here?', 'Second]'])
+        self.assertEqual(list(items), [])
+
+    def test_empty_array(self):
+        self.assertEqual(list(llm.iter_array_items(['{"Questions"', ': []}'], 'Questions')), [])
+
+
+class FakePubSub:
+    """
+    Stands in for redis.asyncio's PubSub: replays queued messages, then
+    times out like an idle channel.
+    """
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.channels = []
+        self.closed = False
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+        if self.messages:
+            return {'type': 'message', 'data': self.messages.pop(0)}
+        return None
+
+    async def unsubscribe(self):
+        pass
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeAsyncRedis:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def pubsub(self):
+        return self._pubsub
+
+    async def aclose(self):
+        pass
+
+
+def parse_sse(body):
+    parsed = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if lines:
+            parsed.append((lines['event'], json.loads(lines['data'])))
+    return parsed
+
+
+@override_settings(SSE_HEARTBEAT_SECONDS=0, SSE_MAX_DURATION=5)
+@without_redis
+class ReviewEventsTests(TestCase):
+    def setUp(self):
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, **fields)
+
+    async def stream(self, pubsub):
+        with mock.patch.object(events, 'async_redis', return_value=FakeAsyncRedis(pubsub)):
+            response = await self.async_client.get(f'/api/design-review/{self.review.id}/events/')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        return parse_sse(body)
+
+    async def test_snapshot_then_published_events_until_reviewed(self):
+        await ProbingQuestions.objects.acreate(designReview=self.review, question='First?', difficulty=2)
+        pubsub = FakePubSub([
+            events.encode('status', {'design_review_id': self.review.id, 'status': 'Questions Generated'}),
+            events.encode('status', {'design_review_id': self.review.id, 'status': 'Reviewed'}),
+            events.encode('status', {'design_review_id': self.review.id, 'status': 'never sent'}),
+        ])
+        received = await self.stream(pubsub)
+
+        self.assertEqual(pubsub.channels, [events.channel_name(self.review.id)])
+        self.assertEqual([event for event, _ in received], ['status', 'question', 'status', 'status'])
+        self.assertEqual(received[1][1]['question'], 'First?')
+        self.assertEqual([data['status'] for event, data in received if event == 'status'],
+                         ['Pending', 'Questions Generated', 'Reviewed'])
+        self.assertTrue(pubsub.closed)
+
+    async def test_finished_review_returns_snapshot_only(self):
+        self.review.status = 'Reviewed'
+        await self.review.asave()
+        received = await self.stream(FakePubSub([]))
+        self.assertEqual(received, [('status', {'design_review_id': self.review.id, 'status': 'Reviewed'})])
+
+    async def test_stream_closes_when_generation_fails(self):
+        pubsub = FakePubSub([
+            events.encode('status', {'design_review_id': self.review.id, 'status': 'Failed'}),
+            events.encode('status', {'design_review_id': self.review.id, 'status': 'never sent'}),
+        ])
+        received = await self.stream(pubsub)
+        self.assertEqual([data['status'] for _, data in received], ['Pending', 'Failed'])
+        self.assertTrue(pubsub.closed)
+
+    async def test_unknown_review(self):
+        response = await self.async_client.get('/api/design-review/999/events/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_tasks_publish_questions_and_status(self):
+        with mock.patch.object(events, 'publish') as publish, \
+                override_settings(LLM_BACKEND='api.llm.LocalBackend', LLM_BACKEND_OPTIONS={'latency': 'fixed', 'latency_ms': 0}):
+            llm.reset_backend()
+            self.addCleanup(llm.reset_backend)
+            generate_probing_questions_for_review(self.review.id)
+        published = [call.args[1] for call in publish.call_args_list]
+        self.assertEqual(published[-1], 'status')
+        self.assertEqual(set(published[:-1]), {'question'})
+        self.assertEqual(len(published) - 1, self.review.probing_questions.count())
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        self.candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(self.candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=self.candidate, **fields)
+        ProbingQuestions.objects.create(designReview=self.review, question='Why a KV store?', difficulty=3)
+
+    async def test_questions(self):
+        response = await self.async_client.get(f'/api/design-review/{self.review.id}/questions/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['questions_count'], 1)
+        self.assertEqual(body['questions'][0]['question'], 'Why a KV store?')
+
+    async def test_evaluation_before_and_after_scoring(self):
+        url = f'/api/design-review/{self.review.id}/evaluation/'
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['has_evaluation'], False)
+
+        await DesignReviewScore.objects.acreate(
+            designReview=self.review, overallscore=3.5, status='Completed', reviewedOn=timezone.now(), technicalDepth=4,
+            systemDesign=3, tradeoff=4, ownership=3, feedbackSummary='Solid.',
+        )
+        body = (await self.async_client.get(url)).json()
+        self.assertEqual(body['candidate_name'], 'Ada')
+        self.assertEqual(body['overall_score'], 3.5)
+        self.assertEqual(body['scores']['tradeoff'], 4)
+
+    async def test_detail_matches_serializer(self):
+        response = await self.async_client.get(f'/api/design-review/{self.review.id}/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['id'], self.review.id)
+        self.assertEqual(len(body['probing_questions']), 1)
+
+    async def test_unknown_review_is_404(self):
+        for path in ('questions/', 'evaluation/', ''):
+            response = await self.async_client.get(f'/api/design-review/999/{path}')
+            self.assertEqual(response.status_code, 404, path)
+
+    def test_detail_writes_still_go_through_the_viewset(self):
+        response = self.client.patch(f'/api/design-review/{self.review.id}/',
+                                     encode_multipart(BOUNDARY, {'status': 'Finalized'}),
+                                     content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'Finalized')
+        response = self.client.delete(f'/api/design-review/{self.review.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(DesignReview.objects.filter(id=self.review.id).exists())
+
+
+class BulkAnswerTests(TestCase):
+    def setUp(self):
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, status='Questions Generated', **fields)
+
+    def submit(self, questions):
+        payload = {'answers': [{'question_id': q.id, 'answer': f'Answer to {q.question}'} for q in questions]}
+        return self.client.post(f'/api/design-review/{self.review.id}/questions/answer/', payload, content_type='application/json')
+
+    def add_questions(self, count):
+        return [ProbingQuestions.objects.create(designReview=self.review, question=f'Q{i}?', difficulty=1)
+                for i in range(count)]
+
+    def test_query_count_does_not_grow_with_answers(self):
+        questions = self.add_questions(2)
+        with CaptureQueriesContext(connection) as small, \
+                mock.patch('api.tasks.evaluate_design_review_task.apply_async'):
+            self.assertEqual(self.submit(questions).status_code, 200)
+
+        self.review = DesignReview.objects.create(candidate=self.review.candidate, status='Questions Generated')
+        questions = self.add_questions(12)
+        with self.assertNumQueries(len(small)), \
+                mock.patch('api.tasks.evaluate_design_review_task.apply_async'):
+            response = self.submit(questions)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['successfully_updated'], 12)
+
+    def test_all_answered_moves_to_evaluating_and_enqueues_on_commit(self):
+        questions = self.add_questions(3)
+        with mock.patch('api.tasks.evaluate_design_review_task.apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.submit(questions)
+        self.assertEqual(response.status_code, 200)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'Evaluating')
+        apply_async.assert_called_once_with(args=[self.review.id], task_id=self.review.evaluationTaskId)
+        self.assertEqual(
+            list(self.review.probing_questions.order_by('id').values_list('answer', flat=True)),
+            ['Answer to Q0?', 'Answer to Q1?', 'Answer to Q2?'],
+        )
+
+    def test_repeated_submissions_enqueue_one_evaluation(self):
+        questions = self.add_questions(3)
+        with mock.patch('api.tasks.evaluate_design_review_task.apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.submit(questions)
+            self.submit(questions)
+            self.client.post(f'/api/question/{questions[0].id}/answer/', {'answer': 'Again.'})
+            response = self.client.post(f'/api/design-review/{self.review.id}/evaluate/')
+        self.assertEqual(apply_async.call_count, 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['task_id'], apply_async.call_args.kwargs['task_id'])
+
+    def test_unknown_question_updates_nothing(self):
+        questions = self.add_questions(2)
+        other = DesignReview.objects.create(candidate=self.review.candidate, status='Questions Generated')
+        foreign = ProbingQuestions.objects.create(designReview=other, question='Elsewhere?', difficulty=1)
+        response = self.submit([questions[0], foreign])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([q['question_id'] for q in response.json()['not_found_questions']], [foreign.id])
+        self.assertFalse(self.review.probing_questions.filter(answer__isnull=False).exists())
+
+
+@override_settings(LLM_BACKEND='api.llm.LocalBackend', LLM_BACKEND_OPTIONS={'latency': 'fixed', 'latency_ms': 0})
+@without_redis
+class ReviewStateTests(TestCase):
+    def setUp(self):
+        llm.reset_backend()
+        self.addCleanup(llm.reset_backend)
+        tasks.evaluation_memo.clear()
+        patcher = mock.patch.object(events, 'publish')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, status='In Progress', **fields)
+        ProbingQuestions.objects.create(designReview=self.review, question='Why?', answer='Because.', difficulty=1)
+
+    def request(self):
+        with mock.patch('api.tasks.evaluate_design_review_task.apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            return review_state.request_evaluation(self.review.id)
+
+    def test_only_the_first_request_wins(self):
+        task_id = self.request()
+        self.assertIsNotNone(task_id)
+        self.assertIsNone(self.request())
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.evaluationTaskId), ('Evaluating', task_id))
+
+    def test_unanswered_review_is_not_evaluated(self):
+        ProbingQuestions.objects.create(designReview=self.review, question='And?', difficulty=1)
+        self.assertIsNone(self.request())
+
+    def test_only_the_owning_task_writes_its_result(self):
+        task_id = self.request()
+        result = evaluate_design_review_task.apply(args=[self.review.id], task_id='duplicate').get()
+        self.assertIn('skipped', result)
+        self.assertFalse(DesignReviewScore.objects.exists())
+
+        result = evaluate_design_review_task.apply(args=[self.review.id], task_id=task_id).get()
+        self.assertTrue(result['success'])
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.evaluationTaskId), ('Reviewed', None))
+
+    def test_cancelled_evaluation_is_discarded(self):
+        task_id = self.request()
+        with mock.patch('celery.app.control.Control.revoke') as revoke, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(review_state.cancel_evaluation(self.review.id), task_id)
+        revoke.assert_called_once_with(task_id)
+        result = evaluate_design_review_task.apply(args=[self.review.id], task_id=task_id).get()
+        self.assertIn('skipped', result)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'In Progress')
+
+    def test_evaluation_fails_once_its_retries_are_used_up(self):
+        task_id = self.request()
+        with mock.patch.object(llm.LocalBackend, 'generate', side_effect=llm.LLMTimeout('deadline passed')):
+            result = evaluate_design_review_task.apply(
+                args=[self.review.id], task_id=task_id, retries=settings.LLM_RETRY_MAX_RETRIES).get()
+        self.assertIn('Failed', result)
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.evaluationOutcome), ('Failed', 'failed'))
+        self.assertEqual(self.review.evaluationRetries, settings.LLM_RETRY_MAX_RETRIES)
+
+    def test_failed_evaluation_can_be_requested_again(self):
+        task_id = self.request()
+        with mock.patch.object(llm.LocalBackend, 'generate', side_effect=llm.LLMError('boom')):
+            evaluate_design_review_task.apply(args=[self.review.id], task_id=task_id).get()
+        self.review.refresh_from_db()
+        self.assertEqual((self.review.status, self.review.evaluationTaskId), ('Failed', None))
+        self.assertIsNotNone(self.request())
+
+
+class ListingQueryCountTests(TestCase):
+    """
+    Listings must cost the same number of queries for any number of rows:
+    one for the rows plus one per prefetched relation.
+    """
+
+    def add_candidates(self, count):
+        for i in range(count):
+            candidate = Candidate.objects.create(name=f'Candidate {i}', designation='Engineer')
+            fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+            for _ in range(2):
+                review = DesignReview.objects.create(candidate=candidate, **fields)
+                DesignDocument.objects.create(path=f'design_documents/{i}.pdf', type='.pdf', size=1, designReview=review)
+                ProbingQuestions.objects.create(designReview=review, question='Why?', difficulty=1)
+                DesignReviewScore.objects.create(
+                    designReview=review, overallscore=3, status='Completed', reviewedOn=timezone.now(),
+                    technicalDepth=3, systemDesign=3, tradeoff=3, ownership=3, feedbackSummary='Fine.',
+                )
+
+    def assertConstantQueries(self, url, expected):
+        for count in (1, 10):
+            self.add_candidates(count)
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_candidate_listings(self):
+        # candidates, reviews, documents, questions, scores
+        self.assertConstantQueries('/api/candidate/', 5)
+        self.assertConstantQueries('/api/candidates/', 5)
+
+    def test_design_review_listing(self):
+        # reviews, documents, questions, scores
+        self.assertConstantQueries('/api/design-review/', 4)
+
+    def test_lookups_follow_nested_serializers(self):
+        self.assertEqual(CandidateSerializer().eager_loading_lookups(), ([], [
+            'design_reviews', 'design_reviews__documents', 'design_reviews__probing_questions', 'design_reviews__scores',
+        ]))
+
+    def test_summary_rows_skip_unrequested_relations(self):
+        self.add_candidates(3)
+        # reviews only: no documents, questions or scores are loaded
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/design-review/?fields=id,status,candidate')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'status', 'candidate'})
+        # candidates and reviews, plus the one nested relation asked for
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/candidate/?expand=design_reviews.scores')
+        review = response.json()['results'][0]['design_reviews'][0]
+        self.assertIn('scores', review)
+        self.assertNotIn('probing_questions', review)
+
+
+class ListingPaginationTests(TestCase):
+    def setUp(self):
+        self.candidates = [Candidate.objects.create(name=f'Candidate {i}', designation='Engineer') for i in range(5)]
+
+    def test_cursor_pages_are_newest_first_and_complete(self):
+        names, url = [], '/api/candidate/?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            self.assertLessEqual(len(body['results']), 2)
+            names += [row['name'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(names, [c.name for c in reversed(self.candidates)])
+
+    def test_nested_sparse_fields(self):
+        candidate = self.candidates[0]
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        review = DesignReview.objects.create(candidate=candidate, **fields)
+        body = self.client.get(f'/api/candidate/{candidate.id}/?fields=name,design_reviews.status').json()
+        self.assertEqual(body, {'name': candidate.name, 'design_reviews': [{'status': review.status}]})
+        response = self.client.get(f'/api/design-review/{review.id}/?fields=status,scores')
+        self.assertEqual(response.json(), {'status': review.status, 'scores': []})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/candidate/?fields=name,design_reviews.nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('design_reviews.nope', response.json()['fields'])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, **fields)
+        self.question = ProbingQuestions.objects.create(designReview=self.review, question='Why?', difficulty=1)
+        self.urls = [f'/api/design-review/{self.review.id}/{path}' for path in ('', 'questions/', 'evaluation/')]
+
+    def test_unchanged_review_revalidates_with_one_query(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+            with self.assertNumQueries(1):
+                cached = self.client.get(url, headers={'If-None-Match': response['ETag']})
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], response['ETag'])
+            self.assertEqual(cached.content, b'')
+            cached = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+            self.assertEqual(cached.status_code, 304)
+
+    def test_head_returns_the_headers_of_get_without_a_body(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            head = self.client.head(url)
+            self.assertEqual(head.status_code, 200, url)
+            self.assertEqual(head['ETag'], response['ETag'])
+            self.assertEqual(int(head['Content-Length']), len(response.content))
+            cached = self.client.head(url, headers={'If-None-Match': response['ETag']})
+            self.assertEqual(cached.status_code, 304)
+
+        # The view drops the body itself, not just the test client
+        request = RequestFactory().head(self.urls[1])
+        response = async_to_sync(views.get_probing_questions_by_design_review)(request, self.review.id)
+        self.assertEqual((response.status_code, response.content), (200, b''))
+
+    def test_etag_changes_with_related_rows(self):
+        url = self.urls[0]
+        etags = [self.client.get(url)['ETag']]
+        self.client.post(f'/api/question/{self.question.id}/answer/', {'answer': 'Because.'})
+        etags.append(self.client.get(url)['ETag'])
+        self.question.delete()
+        etags.append(self.client.get(url)['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+        response = self.client.get(url, headers={'If-None-Match': etags[0]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_representations_have_distinct_etags(self):
+        etags = {self.client.get(url)['ETag'] for url in self.urls + [self.urls[0] + '?fields=id']}
+        self.assertEqual(len(etags), 4)
+
+
+@without_redis
+class EvaluationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(self.candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=self.candidate, status='Reviewed', **fields)
+        self.score = DesignReviewScore.objects.create(
+            designReview=self.review, overallscore=3.5, status='Completed', reviewedOn=timezone.now(),
+            technicalDepth=4, systemDesign=3, tradeoff=4, ownership=3, feedbackSummary='Solid.',
+        )
+        self.url = f'/api/design-review/{self.review.id}/evaluation/'
+
+    def test_repeat_reads_are_served_from_cache(self):
+        self.assertEqual(self.client.get(self.url).json()['feedback_summary'], 'Solid.')
+        # only the conditional-GET validators still hit the database
+        with self.assertNumQueries(1):
+            body = self.client.get(self.url).json()
+        self.assertEqual(body['overall_score'], 3.5)
+        counters = self.client.get('/api/metrics/').json()
+        self.assertEqual(counters['counters']['cache.evaluation.hit'], 1)
+        self.assertEqual(counters['hit_rates']['cache.evaluation'], 0.5)
+
+    def test_writes_invalidate(self):
+        self.client.get(self.url)
+        self.score.feedbackSummary = 'Revised.'
+        self.score.save()
+        self.assertEqual(self.client.get(self.url).json()['feedback_summary'], 'Revised.')
+
+        self.candidate.name = 'Ada L.'
+        self.candidate.save()
+        self.assertEqual(self.client.get(self.url).json()['candidate_name'], 'Ada L.')
+
+        # status transitions are bulk updates and skip post_save
+        review_state.transition(self.review.id, ['Reviewed'], 'In Progress')
+        self.assertEqual(self.client.get(self.url).json()['status'], 'In Progress')
+
+    def test_concurrent_misses_render_once(self):
+        renders = []
+
+        async def render():
+            renders.append(1)
+            await asyncio.sleep(0.1)
+            return {'rendered': True}
+
+        async def read_concurrently():
+            return await asyncio.gather(*(evaluation_cache.get_or_render(self.review.id, render) for _ in range(5)))
+
+        results = async_to_sync(read_concurrently)()
+        self.assertEqual(results, [{'rendered': True}] * 5)
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(metrics.snapshot()['counters']['cache.evaluation.lock_wait_hit'], 4)
+
+    def test_cache_outage_falls_back_to_the_database(self):
+        with mock.patch.object(cache, 'aget', side_effect=ConnectionError('redis down')), \
+                self.assertLogs('api.evaluation_cache', 'WARNING'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['feedback_summary'], 'Solid.')
+        self.assertEqual(metrics.snapshot()['counters']['cache.evaluation.errors'], 1)
+
+
+class QuestionCounterTests(TestCase):
+    def setUp(self):
+        candidate = Candidate.objects.create(name='Ada', designation='Senior Engineer')
+        fields = {k: v for k, v in review_form(candidate).items() if k != 'candidate'}
+        self.review = DesignReview.objects.create(candidate=candidate, status='Questions Generated', **fields)
+        self.questions = [ProbingQuestions.objects.create(designReview=self.review, question=f'Q{i}?', difficulty=1)
+                          for i in range(3)]
+
+    def counters(self):
+        self.review.refresh_from_db()
+        return self.review.questionsTotal, self.review.questionsAnswered
+
+    def answer(self, question, text):
+        return self.client.post(f'/api/question/{question.id}/answer/', {'answer': text})
+
+    def test_only_first_answers_count(self):
+        self.assertEqual(self.counters(), (3, 0))
+        self.answer(self.questions[0], 'One.')
+        self.answer(self.questions[0], 'One, revised.')
+        self.assertEqual(self.counters(), (3, 1))
+        payload = {'answers': [{'question_id': q.id, 'answer': 'Bulk.'} for q in self.questions[:2]]}
+        self.client.post(f'/api/design-review/{self.review.id}/questions/answer/', payload, content_type='application/json')
+        self.assertEqual(self.counters(), (3, 2))
+        self.assertEqual(ProbingQuestions.objects.get(id=self.questions[0].id).answer, 'Bulk.')
+
+    def test_completeness_is_a_single_row_read(self):
+        ProbingQuestions.objects.filter(designReview=self.review).update(answer='Done.')
+        self.assertFalse(review_state.is_fully_answered(self.review.id))
+        review_state.count_questions(self.review.id, answered=3)
+        with self.assertNumQueries(1):
+            self.assertTrue(review_state.is_fully_answered(self.review.id))
+
+    def test_deleting_questions_adjusts_counters(self):
+        with mock.patch('api.tasks.evaluate_design_review_task.apply_async'):
+            self.answer(self.questions[0], 'One.')
+        ProbingQuestions.objects.get(id=self.questions[0].id).delete()
+        self.questions[1].delete()
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_backfill_counts_existing_questions(self):
+        migration = importlib.import_module('api.migrations.0008_designreview_question_counters')
+        ProbingQuestions.objects.filter(id=self.questions[0].id).update(answer='Done.')
+        DesignReview.objects.update(questionsTotal=0, questionsAnswered=0)
+        empty = DesignReview.objects.create(candidate=self.review.candidate)
+        migration.count_existing_questions(django_apps, None)
+        self.assertEqual(self.counters(), (3, 1))
+        empty.refresh_from_db()
+        self.assertEqual((empty.questionsTotal, empty.questionsAnswered), (0, 0))
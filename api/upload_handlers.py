@@ -0,0 +1,194 @@
+"""
+Single-pass ingestion of design document uploads.
+
+BlobUploadHandler writes each uploaded file straight into the blob store
+directory while the request body streams in, so memory use stays at one
+chunk per upload however large the file. The same pass hashes the content,
+sniffs its MIME type from the leading bytes, counts PDF pages and enforces
+the per-file and per-review size limits. The resulting BlobUploadedFile
+carries the digest, so storing it is a rename (see blob_store.prepare_upload).
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException, UnsupportedMediaType
+
+from . import blob_store
+
+# Leading bytes of the formats we can tell apart; anything else that decodes
+# as UTF-8 is treated as text.
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0', 'application/x-ole-storage'),
+)
+# A page object; /Type /Pages (the page tree) is excluded by the lookahead
+PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+# Bytes kept from the end of a chunk so a marker split across chunks is seen
+PDF_PAGE_OVERLAP = 32
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Uploaded files are too large.'
+    default_code = 'upload_too_large'
+
+
+def sniff_mime_type(head):
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # A multi-byte character cut off at the end of the sample is fine
+        if exc.start < len(head) - 3:
+            return 'application/octet-stream'
+    return 'text/plain'
+
+
+class PageCounter:
+    """
+    Count PDF page objects in data fed chunk by chunk. Pages kept in
+    compressed object streams are not seen, so a count of 0 means unknown.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.tail = b''
+
+    def feed(self, data):
+        window = self.tail + data
+        keep_from = max(0, len(window) - PDF_PAGE_OVERLAP)
+        for match in PDF_PAGE.finditer(window):
+            if match.end() == len(window):
+                # '/Type /Page' may still become '/Type /Pages'; decide on
+                # the next chunk
+                keep_from = min(keep_from, match.start())
+                break
+            self.pages += 1
+            keep_from = max(keep_from, match.end())
+        # Carry the end of the window over, minus counted markers, so no
+        # marker is counted twice or missed at a chunk boundary
+        self.tail = window[keep_from:]
+
+
+def sniff_file(path, chunk_size=64 * 1024):
+    """
+    Return (mime_type, page_count) for a file already on disk.
+    """
+    with open(path, 'rb') as fh:
+        head = fh.read(chunk_size)
+        mime_type = sniff_mime_type(head[:512])
+        if mime_type != 'application/pdf':
+            return mime_type, None
+        counter = PageCounter()
+        while head:
+            counter.feed(head)
+            head = fh.read(chunk_size)
+    return mime_type, counter.pages or None
+
+
+class BlobUploadedFile(UploadedFile):
+    """
+    An upload already written to a temporary file inside the blob store.
+    Like Django's TemporaryUploadedFile, the file is removed on close unless
+    it has been moved into the store by then.
+    """
+
+    def __init__(self, file, name, content_type, size, charset, digest, page_count):
+        super().__init__(file, name, content_type, size, charset)
+        self.digest = digest
+        self.page_count = page_count
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        finally:
+            try:
+                os.unlink(self.file.name)
+            except FileNotFoundError:
+                # Moved into the store, or already discarded
+                pass
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """
+    Stream uploads into temporary files next to the blob store, hashing,
+    sniffing, size-checking and page-counting them on the way. The page
+    count is None for files that are not PDFs or whose pages are not found.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.review_size = 0
+        self.root = None
+        self.file = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.root = blob_store.blob_root()
+        os.makedirs(self.root, exist_ok=True)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = tempfile.NamedTemporaryFile(dir=self.root, suffix='.part', delete=False)
+        self.hash = hashlib.new(blob_store.HASH_ALGORITHM)
+        self.size = 0
+        self.mime_type = None
+        self.page_counter = PageCounter()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        self.review_size += len(raw_data)
+        if self.size > settings.UPLOAD_MAX_FILE_SIZE:
+            self._abort(UploadTooLarge(
+                f'{self.file_name} is larger than {settings.UPLOAD_MAX_FILE_SIZE} bytes.'))
+        if self.review_size > settings.UPLOAD_MAX_REVIEW_SIZE:
+            self._abort(UploadTooLarge(
+                f'The files of a design review may not exceed {settings.UPLOAD_MAX_REVIEW_SIZE} bytes in total.'))
+        if self.mime_type is None:
+            self.mime_type = sniff_mime_type(raw_data[:512])
+            if self.mime_type not in settings.UPLOAD_ALLOWED_MIME_TYPES:
+                self._abort(UnsupportedMediaType(self.mime_type, f'{self.file_name} is of unsupported type {self.mime_type}.'))
+        if self.mime_type == 'application/pdf':
+            self.page_counter.feed(raw_data)
+        self.hash.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        uploaded = BlobUploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.mime_type or 'text/plain',
+            size=file_size,
+            charset=self.charset,
+            digest=self.hash.hexdigest(),
+            page_count=(self.page_counter.pages or None) if self.mime_type == 'application/pdf' else None,
+        )
+        self.file = None
+        return uploaded
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+            os.unlink(self.file.name)
+            self.file = None
+
+    def _abort(self, exc):
+        # Files completed before this one are closed (and so removed) by the
+        # multipart parser when the exception propagates.
+        self.upload_interrupted()
+        raise exc
@@ -4,11 +4,14 @@ from .views import (
     CandidateViewSet, 
     CandidateListView, 
     DesignReviewViewSet,
+    design_review_detail,
+    get_metrics,
     get_probing_questions_by_design_review,
     answer_probing_questions_by_design_review,
     answer_single_probing_question,
     trigger_design_review_evaluation,
-    get_design_review_evaluation
+    get_design_review_evaluation,
+    design_review_events
 )
 
 router = DefaultRouter()
@@ -16,6 +19,8 @@ router.register(r'candidate', CandidateViewSet, basename='candidate')
 router.register(r'design-review', DesignReviewViewSet, basename='design-review')
 
 urlpatterns = [
+    # Async detail read; listed ahead of the router's sync design-review detail route
+    path('design-review/<int:pk>/', design_review_detail, name='design-review-detail-async'),
     path('', include(router.urls)),
     path('candidates/', CandidateListView.as_view(), name='candidate-list'),
     path('design-review/<int:design_review_id>/questions/', get_probing_questions_by_design_review, name='get-probing-questions'),
@@ -23,4 +28,6 @@ urlpatterns = [
     path('question/<int:question_id>/answer/', answer_single_probing_question, name='answer-single-question'),
     path('design-review/<int:design_review_id>/evaluate/', trigger_design_review_evaluation, name='trigger-evaluation'),
     path('design-review/<int:design_review_id>/evaluation/', get_design_review_evaluation, name='get-evaluation'),
+    path('design-review/<int:design_review_id>/events/', design_review_events, name='design-review-events'),
+    path('metrics/', get_metrics, name='metrics'),
 ] 
\ No newline at end of file
@@ -1,30 +1,71 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
 from .models import Candidate, DesignReview, DesignDocument, ProbingQuestions, DesignReviewScore
+from .pagination import CreatedOnCursorPagination
+from .upload_handlers import BlobUploadHandler
 from .serializers import CandidateSerializer, DesignReviewSerializer, ProbingQuestionsSerializer, AnswerProbingQuestionsSerializer, SingleQuestionAnswerSerializer
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Value
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from .tasks import generate_probing_questions_for_review, evaluate_design_review_task
+from .tasks import ingest_review
+from . import blob_store, conditional, evaluation_cache, events, metrics, review_state
+import asyncio
+import functools
+import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 
-class CandidateViewSet(viewsets.ModelViewSet):
+class SparseFieldsetViewMixin:
+    """
+    Pass the ``fields``/``expand`` query parameters of a read to the
+    serializer (see SparseFieldsetMixin), and load only the relations the
+    pruned serializer renders, so a listing costs a fixed number of queries
+    however many rows it returns.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', self.request.query_params.get('fields'))
+            kwargs.setdefault('expand', self.request.query_params.get('expand'))
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        return self.get_serializer().setup_eager_loading(super().get_queryset())
+
+class CandidateViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Candidate.objects.all()
     serializer_class = CandidateSerializer
+    pagination_class = CreatedOnCursorPagination
 
-class CandidateListView(generics.ListAPIView):
+class CandidateListView(SparseFieldsetViewMixin, generics.ListAPIView):
     queryset = Candidate.objects.all()
     serializer_class = CandidateSerializer
+    pagination_class = CreatedOnCursorPagination
 
-class DesignReviewViewSet(viewsets.ModelViewSet):
+class DesignReviewViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = DesignReview.objects.all()
     serializer_class = DesignReviewSerializer
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = CreatedOnCursorPagination
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Stream uploaded documents into the blob store instead of buffering them
+        request.upload_handlers = [BlobUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         files = request.FILES.getlist('files')
@@ -39,60 +80,112 @@ class DesignReviewViewSet(viewsets.ModelViewSet):
         print(data)
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        design_review = serializer.save()
-        for f in files:
-            # Save file to media folder
-            media_folder = os.path.join(settings.MEDIA_ROOT, 'design_documents')
-            os.makedirs(media_folder, exist_ok=True)
-            file_name = f.name.replace('\\', '/').replace('\\', '/')
-            file_path = f'design_documents/{file_name}'
-            full_path = os.path.join(settings.MEDIA_ROOT, 'design_documents', f.name)
-            with open(full_path, 'wb+') as destination:
-                for chunk in f.chunks():
-                    destination.write(chunk)
-            # Store media file URL path in db
-            DesignDocument.objects.create(
-                path=file_path,  # store relative media path with forward slashes
-                type=os.path.splitext(f.name)[1],
-                size=f.size,
-                designReview=design_review,
-                isProcessed='pending',
-                createdOn=timezone.now(),
-                updatedOn=timezone.now(),
-            )
-        generate_probing_questions_for_review.delay(design_review.id)
+        stored_digests = []
+        prepared = []
+        try:
+            # Hash and spool the files first, so the transaction below (and
+            # the database write lock) is not held during file I/O
+            prepared = [blob_store.prepare_upload(f) for f in files]
+            # The review, blob references and documents commit together, so a
+            # failed upload never leaves a refCount without its document.
+            with transaction.atomic():
+                design_review = serializer.save()
+                for f, upload in zip(files, prepared):
+                    # Store content once per digest; identical uploads share the blob
+                    blob = blob_store.store_prepared(f, upload)
+                    stored_digests.append(blob.digest)
+                    DesignDocument.objects.create(
+                        path=blob.path,  # store relative media path with forward slashes
+                        name=os.path.basename(f.name.replace('\\', '/')),
+                        blob=blob,
+                        type=os.path.splitext(f.name)[1],
+                        size=blob.size,
+                        designReview=design_review,
+                        isProcessed='pending',
+                        createdOn=timezone.now(),
+                        updatedOn=timezone.now(),
+                    )
+                # Preprocess the documents in parallel, then generate; the
+                # candidate is waiting for the questions: use the interactive lane
+                transaction.on_commit(lambda: ingest_review(design_review.id, queue=settings.CELERY_INTERACTIVE_QUEUE))
+        except Exception:
+            blob_store.discard_prepared(prepared)
+            blob_store.discard_orphans(stored_digests)
+            raise
         headers = self.get_success_headers(serializer.data)
         return Response(self.get_serializer(design_review, context={'request': request}).data, status=status.HTTP_201_CREATED, headers=headers)
 
-@api_view(['GET'])
-def get_probing_questions_by_design_review(request, design_review_id):
+def _json(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def _allow_head(view):
+    """
+    Answer HEAD with an async GET view's status and headers, validators and
+    Content-Length included, but no body.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await view(request, *args, **kwargs)
+        if request.method == 'HEAD' and not response.streaming and response.content:
+            response['Content-Length'] = len(response.content)
+            response.content = b''
+        return response
+    return wrapper
+
+
+
+@_allow_head
+async def get_probing_questions_by_design_review(request, design_review_id):
     """
     Get all probing questions for a specific design review ID
     """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
     try:
-        # Check if design review exists
-        design_review = get_object_or_404(DesignReview, id=design_review_id)
+        # Check if design review exists; a client revalidating an unchanged
+        # copy gets 304 without the questions being loaded
+        validators = await conditional.review_validators(design_review_id, request.get_full_path())
+        if validators is None:
+            return _json({
+                'error': 'Design review not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        response = conditional.not_modified(request, validators)
+        if response is not None:
+            return response
         
         # Get all probing questions for this design review
-        probing_questions = ProbingQuestions.objects.filter(designReview=design_review)
+        probing_questions = [
+            question async for question in ProbingQuestions.objects.filter(designReview_id=design_review_id)
+        ]
         
         serializer = ProbingQuestionsSerializer(probing_questions, many=True)
         
-        return Response({
+        return conditional.set_validators(_json({
             'design_review_id': design_review_id,
-            'questions_count': probing_questions.count(),
+            'questions_count': len(probing_questions),
             'questions': serializer.data
-        }, status=status.HTTP_200_OK)
+        }), validators)
         
-    except DesignReview.DoesNotExist:
-        return Response({
-            'error': 'Design review not found'
-        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({
+        return _json({
             'error': f'An error occurred: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def start_evaluation(design_review_id):
+    """
+    Called inside the answer transaction once every question is answered:
+    the review moves to In Progress, then to Evaluating. Only the request that
+    wins the Evaluating transition enqueues the evaluation, so concurrent
+    answer submissions cannot evaluate twice.
+    """
+    review_state.transition(design_review_id, ['Questions Generated', 'Reviewed', 'Failed'], 'In Progress')
+    task_id = review_state.request_evaluation(design_review_id, ['In Progress'])
+    if task_id:
+        logger.info("All questions answered for design review %s. Starting evaluation task.", design_review_id)
+    return task_id
+
+
 @api_view(['POST'])
 def answer_probing_questions_by_design_review(request, design_review_id):
     """
@@ -117,39 +210,24 @@ def answer_probing_questions_by_design_review(request, design_review_id):
                 'error': 'No answers provided'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # First, validate all question IDs exist before updating any answers
-        not_found_questions = []
-        valid_questions = []
+        # Null checks
+        if any(answer_item.get('question_id') is None for answer_item in answers_data):
+            return Response({
+                'error': 'question_id is required for all answers'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        for answer_item in answers_data:
-            question_id = answer_item.get('question_id')
-            answer_text = answer_item.get('answer', '')
-            
-            # Null checks
-            if question_id is None:
-                return Response({
-                    'error': 'question_id is required for all answers'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                # Check if the specific probing question exists
-                probing_question = ProbingQuestions.objects.get(
-                    id=question_id, 
-                    designReview=design_review
-                )
-
-                valid_questions.append({
-                    'question_obj': probing_question,
-                    'question_id': question_id,
-                    'answer_text': answer_text
-                })
-                
-            except ProbingQuestions.DoesNotExist:
-                not_found_questions.append({
-                    'question_id': question_id,
-                    'status': 'not_found',
-                    'error': f'Question with ID {question_id} not found for this design review'
-                })
+        # First, validate all question IDs exist before updating any answers:
+        # one query for the whole batch
+        question_ids = [answer_item['question_id'] for answer_item in answers_data]
+        questions_by_id = ProbingQuestions.objects.filter(designReview=design_review).in_bulk(question_ids)
+        not_found_questions = [
+            {
+                'question_id': question_id,
+                'status': 'not_found',
+                'error': f'Question with ID {question_id} not found for this design review'
+            }
+            for question_id in question_ids if question_id not in questions_by_id
+        ]
         
         # If any questions are not found, return error response
         if not_found_questions:
@@ -162,38 +240,37 @@ def answer_probing_questions_by_design_review(request, design_review_id):
                 'not_found_questions': not_found_questions
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # All questions are valid, now update all answers
+        # All questions are valid, now update all answers in one statement.
+        # bulk_update skips auto_now, so updatedOn is set here.
+        now = timezone.now()
         updated_questions = []
-        for question_data in valid_questions:
-            question_obj = question_data['question_obj']
-            question_id = question_data['question_id']
-            answer_text = question_data['answer_text']
-            
-            # Update the answer
-            question_obj.answer = answer_text
-            question_obj.save()
-            
+        for answer_item in answers_data:
+            question_obj = questions_by_id[answer_item['question_id']]
+            question_obj.answer = answer_item.get('answer', '')
+            question_obj.updatedOn = now
             updated_questions.append({
-                'question_id': question_id,
+                'question_id': answer_item['question_id'],
                 'question': question_obj.question,
-                'answer': answer_text,
+                'answer': question_obj.answer,
                 'status': 'updated'
             })
-
-        total_probing_questions = ProbingQuestions.objects.filter(designReview=design_review).count()
-        total_answered_questions = ProbingQuestions.objects.filter(designReview=design_review, answer__isnull=False).count()
-        if total_probing_questions <= total_answered_questions:
-            # Update DesignReview status to "In Progress" 
-            design_review.status = 'In Progress'
-            design_review.save()
-            
-            # If all questions are answered, trigger evaluation task
-            if total_probing_questions == total_answered_questions:
-                evaluate_design_review_task.delay(design_review.id)
-                print(f"All questions answered for design review {design_review.id}. Starting evaluation task.")
-        
-        print(total_probing_questions, total_answered_questions)
-        print(f"Remaining questions: {total_probing_questions - total_answered_questions}, answered questions: {total_answered_questions}")
+        
+        with transaction.atomic():
+            # Questions answered for the first time are claimed with a
+            # conditional UPDATE, so a concurrent submission cannot count
+            # the same first answer again
+            first_answers = ProbingQuestions.objects.filter(
+                id__in=questions_by_id, answer__isnull=True
+            ).update(answer=Value(''), updatedOn=now)
+            ProbingQuestions.objects.bulk_update(questions_by_id.values(), ['answer', 'updatedOn'])
+            if first_answers:
+                review_state.count_questions(design_review.id, answered=first_answers)
+            # The transitions leave Pending reviews alone: while questions are
+            # still streaming in, answering every question seen so far does
+            # not complete the review
+            if review_state.is_fully_answered(design_review.id):
+                start_evaluation(design_review.id)
+        
         response_data = {
             'design_review_id': design_review_id,
             'total_answers_processed': len(answers_data),
@@ -238,32 +315,32 @@ def answer_single_probing_question(request, question_id):
                 'question_id': question_id
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Update the answer
+        # Update the answer; the conditional UPDATE tells whether this is
+        # the question's first answer, which the review's counter tracks
         probing_question.answer = answer_text
-        probing_question.save()
+        probing_question.updatedOn = timezone.now()
+        design_review_id = probing_question.designReview_id
+        
+        with transaction.atomic():
+            first_answer = ProbingQuestions.objects.filter(id=question_id, answer__isnull=True).update(
+                answer=answer_text, updatedOn=probing_question.updatedOn)
+            if first_answer:
+                review_state.count_questions(design_review_id, answered=1)
+            else:
+                probing_question.save(update_fields=['answer', 'updatedOn'])
+            # The transitions leave Pending reviews alone: while questions are
+            # still streaming in, answering every question seen so far does
+            # not complete the review
+            if review_state.is_fully_answered(design_review_id):
+                start_evaluation(design_review_id)
         
         # Return the updated question details
         updated_serializer = ProbingQuestionsSerializer(probing_question)
-
-        total_probing_questions = ProbingQuestions.objects.filter(designReview=probing_question.designReview).count()
-        total_answered_questions = ProbingQuestions.objects.filter(designReview=probing_question.designReview, answer__isnull=False).count()
-        if total_probing_questions <= total_answered_questions:
-            # Update DesignReview status to "In Progress"
-            probing_question.designReview.status = 'In Progress'
-            probing_question.designReview.save()
-            
-            # If all questions are answered, trigger evaluation task
-            if total_probing_questions == total_answered_questions:
-                evaluate_design_review_task.delay(probing_question.designReview.id)
-                print(f"All questions answered for design review {probing_question.designReview.id}. Starting evaluation task.")
-        
-        print(total_probing_questions, total_answered_questions)
-        print(f"Remaining questions: {total_probing_questions - total_answered_questions}, answered questions: {total_answered_questions}")
         
         return Response({
             'message': 'Answer updated successfully',
             'question': updated_serializer.data,
-            'design_review_id': probing_question.designReview.id
+            'design_review_id': probing_question.designReview_id
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -280,18 +357,26 @@ def trigger_design_review_evaluation(request, design_review_id):
         # Check if design review exists
         design_review = get_object_or_404(DesignReview, id=design_review_id)
         
+        if design_review.status == 'Failed' and design_review.generationOutcome == 'failed':
+            return Response({
+                'error': 'Probing questions could not be generated for this design review',
+                'last_error': design_review.lastError
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Check if there are any probing questions
-        total_questions = ProbingQuestions.objects.filter(designReview=design_review).count()
+        total_questions = design_review.questionsTotal
         if total_questions == 0:
             return Response({
                 'error': 'No probing questions found for this design review'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        if design_review.status == 'Pending':
+            return Response({
+                'error': 'Probing questions are still being generated for this design review'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # Check if all questions are answered
-        answered_questions = ProbingQuestions.objects.filter(
-            designReview=design_review, 
-            answer__isnull=False
-        ).count()
+        answered_questions = design_review.questionsAnswered
         
         if answered_questions < total_questions:
             return Response({
@@ -301,13 +386,22 @@ def trigger_design_review_evaluation(request, design_review_id):
                 'remaining_questions': total_questions - answered_questions
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Trigger the evaluation task
-        task_result = evaluate_design_review_task.delay(design_review_id)
+        # Trigger the evaluation task; only one caller wins the transition
+        with transaction.atomic():
+            task_id = review_state.request_evaluation(design_review_id)
+        if task_id is None:
+            design_review.refresh_from_db(fields=['status', 'evaluationTaskId'])
+            return Response({
+                'error': f'Design review cannot be evaluated while {design_review.status}',
+                'design_review_id': design_review_id,
+                'status': design_review.status,
+                'task_id': design_review.evaluationTaskId
+            }, status=status.HTTP_409_CONFLICT)
         
         return Response({
             'message': 'Evaluation task triggered successfully',
             'design_review_id': design_review_id,
-            'task_id': task_result.id,
+            'task_id': task_id,
             'total_questions': total_questions,
             'answered_questions': answered_questions
         }, status=status.HTTP_200_OK)
@@ -322,49 +416,172 @@ def trigger_design_review_evaluation(request, design_review_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['GET'])
-def get_design_review_evaluation(request, design_review_id):
+async def _render_design_review_evaluation(design_review_id):
+    design_review = await DesignReview.objects.select_related('candidate').aget(id=design_review_id)
+    
+    # Try to get the evaluation score
+    score = await DesignReviewScore.objects.filter(designReview_id=design_review_id).afirst()
+    if score is None:
+        return {
+            'design_review_id': design_review_id,
+            'status': design_review.status,
+            'message': 'Evaluation not completed yet',
+            'has_evaluation': False,
+            'evaluation_outcome': design_review.evaluationOutcome,
+            'evaluation_retries': design_review.evaluationRetries,
+        }
+    
+    return {
+        'design_review_id': design_review_id,
+        'candidate_name': design_review.candidate.name,
+        'candidate_designation': design_review.candidate.designation,
+        'status': design_review.status,
+        'overall_score': score.overallscore,
+        'scores': {
+            'technical_depth': score.technicalDepth,
+            'system_design': score.systemDesign,
+            'tradeoff': score.tradeoff,
+            'ownership': score.ownership
+        },
+        'feedback_summary': score.feedbackSummary,
+        'reviewed_on': score.reviewedOn,
+        'evaluation_status': score.status
+    }
+
+
+@_allow_head
+async def get_design_review_evaluation(request, design_review_id):
     """
     Get the evaluation results for a specific design review
     """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
     try:
         # Check if design review exists
-        design_review = get_object_or_404(DesignReview, id=design_review_id)
+        validators = await conditional.review_validators(design_review_id, request.get_full_path())
+        if validators is None:
+            return _json({
+                'error': 'Design review not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        response = conditional.not_modified(request, validators)
+        if response is not None:
+            return response
         
-        # Try to get the evaluation score
-        try:
-            score = DesignReviewScore.objects.get(designReview=design_review)
-            
-            return Response({
-                'design_review_id': design_review_id,
-                'candidate_name': design_review.candidate.name,
-                'candidate_designation': design_review.candidate.designation,
-                'status': design_review.status,
-                'overall_score': score.overallscore,
-                'scores': {
-                    'technical_depth': score.technicalDepth,
-                    'system_design': score.systemDesign,
-                    'tradeoff': score.tradeoff,
-                    'ownership': score.ownership
-                },
-                'feedback_summary': score.feedbackSummary,
-                'reviewed_on': score.reviewedOn,
-                'evaluation_status': score.status
-            }, status=status.HTTP_200_OK)
-            
-        except DesignReviewScore.DoesNotExist:
-            return Response({
-                'design_review_id': design_review_id,
-                'status': design_review.status,
-                'message': 'Evaluation not completed yet',
-                'has_evaluation': False
-            }, status=status.HTTP_200_OK)
+        # The rendered payload is shared through the cache until the review,
+        # its candidate or its score changes (see api/signals.py)
+        payload = await evaluation_cache.get_or_render(
+            design_review_id, lambda: _render_design_review_evaluation(design_review_id))
+        return conditional.set_validators(_json(payload), validators)
         
-    except DesignReview.DoesNotExist:
-        return Response({
-            'error': 'Design review not found'
-        }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({
+        return _json({
             'error': f'An error occurred: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+_design_review_detail_sync = DesignReviewViewSet.as_view({
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+
+@csrf_exempt
+@_allow_head
+async def design_review_detail(request, pk):
+    """
+    Design review detail. GET and HEAD are served natively async; writes go
+    to the DesignReviewViewSet as before.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return await sync_to_async(_design_review_detail_sync)(request, pk=pk)
+    try:
+        serializer = DesignReviewSerializer(
+            context={'request': request}, fields=request.GET.get('fields'), expand=request.GET.get('expand'))
+    except ValidationError as e:
+        return _json(e.detail, status=status.HTTP_400_BAD_REQUEST)
+    validators = await conditional.review_validators(pk, request.get_full_path())
+    if validators is None:
+        return _json({'detail': 'No DesignReview matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+    response = conditional.not_modified(request, validators)
+    if response is not None:
+        return response
+    design_review = await serializer.setup_eager_loading(DesignReview.objects.all()).filter(pk=pk).afirst()
+    if design_review is None:
+        return _json({'detail': 'No DesignReview matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+    serializer.instance = design_review
+    return conditional.set_validators(_json(serializer.data), validators)
+
+@api_view(['GET'])
+def get_metrics(request):
+    """
+    Counters, timings and cache hit rates of the process serving the request
+    """
+    return Response(metrics.snapshot(), status=status.HTTP_200_OK)
+
+TERMINAL_STATUSES = ('Reviewed', 'Finalized', 'Failed')
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+
+
+async def _review_snapshot(design_review_id):
+    """
+    Current state of a review as SSE events, sent once a client connects so
+    it does not miss anything published before it subscribed.
+    """
+    review = await DesignReview.objects.aget(id=design_review_id)
+    messages = [_sse('status', {'design_review_id': review.id, 'status': review.status})]
+    async for question in ProbingQuestions.objects.filter(designReview_id=review.id).order_by('id'):
+        messages.append(_sse('question', ProbingQuestionsSerializer(question).data))
+    score = await DesignReviewScore.objects.filter(designReview_id=review.id).afirst()
+    if score is not None:
+        messages.append(_sse('score', events.score_payload(review.id, score)))
+    return review.status, messages
+
+
+async def _review_event_stream(design_review_id):
+    client = events.async_redis()
+    pubsub = client.pubsub()
+    try:
+        # Subscribe before reading the snapshot so no transition falls between them
+        await pubsub.subscribe(events.channel_name(design_review_id))
+        review_status, snapshot = await _review_snapshot(design_review_id)
+        for message in snapshot:
+            yield message
+        if review_status in TERMINAL_STATUSES:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SSE_MAX_DURATION
+        while loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=settings.SSE_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.loads(message['data'])
+            yield _sse(payload['event'], payload['data'])
+            if payload['event'] == 'status' and payload['data'].get('status') in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def design_review_events(request, design_review_id):
+    """
+    Server-Sent Events stream of a design review's progress: status changes,
+    questions as they are generated and the final score. The stream closes
+    after the 'Reviewed' or 'Failed' status or SSE_MAX_DURATION; EventSource reconnects
+    and receives a fresh snapshot.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not await DesignReview.objects.filter(id=design_review_id).aexists():
+        return JsonResponse({'error': 'Design review not found'}, status=404)
+    response = StreamingHttpResponse(_review_event_stream(design_review_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -77,10 +79,24 @@ WSGI_APPLICATION = 'dr_reviewer.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite is shared by the web process and the Celery workers, so it runs in
+# its concurrent profile (benchmark: manage.py benchmark_sqlite_contention):
+# - WAL lets readers proceed while one connection writes, and
+#   synchronous=NORMAL is durable enough under WAL without an fsync per commit.
+# - Transactions start IMMEDIATE, taking the write lock up front. A deferred
+#   transaction that reads and then writes cannot wait for the lock and fails
+#   with "database is locked".
+# - A writer waits up to SQLITE_BUSY_TIMEOUT seconds for the lock.
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
     }
 }
 
@@ -130,13 +146,164 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Celery Configuration
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Question generation and evaluation have their own queues and worker pools,
+# so a backlog of slow evaluations never delays the questions a candidate is
+# waiting for. Reviews submitted through the API get their questions from the
+# interactive lane, which generation workers always drain first; retries go
+# back to the task's own queue. Anything else uses the default 'celery' queue.
+CELERY_INTERACTIVE_QUEUE = 'interactive'
+CELERY_TASK_ROUTES = {
+    'api.tasks.preprocess_design_document': {'queue': 'generation'},
+    'api.tasks.generate_probing_questions_for_review': {'queue': 'generation'},
+    'api.tasks.evaluate_design_review_task': {'queue': 'evaluation'},
+}
+# Consume a worker's queues in the order given (-Q interactive,generation)
+# instead of round robin. Tasks are acknowledged when done (acks_late), so an
+# unacknowledged one is redelivered after the visibility timeout; keep that
+# above the longest task including its retries' countdowns.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'visibility_timeout': 2 * 60 * 60,  # seconds
+}
+# One message reserved per worker slot: a long task never sits behind another
+# in a busy worker's buffer while an idle worker could take it
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Worker pools started by `manage.py start_celery_worker`, one per queue group.
+# Pools marked 'llm' spend their time waiting on the LLM; with
+# LLM_EXECUTION=async they run as one process with LLM_ASYNC_CONCURRENCY
+# threads instead of 'concurrency' processes.
+CELERY_WORKER_POOLS = {
+    'generation': {
+        'queues': [CELERY_INTERACTIVE_QUEUE, 'generation'],
+        'concurrency': int(os.environ.get('CELERY_GENERATION_CONCURRENCY', 8)),
+        'llm': True,
+    },
+    'evaluation': {
+        'queues': ['evaluation'],
+        'concurrency': int(os.environ.get('CELERY_EVALUATION_CONCURRENCY', 4)),
+        'llm': True,
+    },
+    'default': {
+        'queues': ['celery'],
+        'concurrency': int(os.environ.get('CELERY_DEFAULT_CONCURRENCY', 2)),
+    },
+}
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024 
+# Design document uploads stream straight into the blob store
+# (api/upload_handlers.py); these limits are checked while they stream in
+UPLOAD_MAX_FILE_SIZE = 25 * 1024 * 1024
+UPLOAD_MAX_REVIEW_SIZE = 100 * 1024 * 1024  # all files of one design review
+# Sniffed from the content; the types the LLM backend accepts as documents
+UPLOAD_ALLOWED_MIME_TYPES = ['application/pdf', 'text/plain', 'image/png', 'image/jpeg']
+
+# Shared cache (LLM contexts, response memo, evaluation payloads) in the Redis
+# instance Celery already uses, on its own database.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/1')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'dr_reviewer',
+    }
+}
+# Rendered evaluation payloads (api/evaluation_cache.py)
+EVALUATION_CACHE_TTL = 10 * 60  # seconds
+EVALUATION_CACHE_LOCK_WAIT = 2  # seconds to wait for another request rendering the same payload
+
+# Design review progress events (Redis pub/sub, streamed to clients over SSE)
+EVENTS_REDIS_URL = REDIS_URL
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_DURATION = 5 * 60  # seconds; EventSource clients reconnect automatically
+
+# Gemini Configuration
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')  # required by the Celery workers
+GEMINI_MODEL = 'gemini-2.0-flash-001'
+# One pooled HTTP client per worker process; connections are kept alive between tasks
+GEMINI_HTTP_MAX_CONNECTIONS = 10
+GEMINI_HTTP_MAX_KEEPALIVE_CONNECTIONS = 5
+GEMINI_HTTP_KEEPALIVE_EXPIRY = 120  # seconds
+GEMINI_HTTP_TIMEOUT_MS = 120 * 1000
+
+# LLM backend used by the tasks. Set LLM_BACKEND=api.llm.LocalBackend to run the
+# pipeline offline; LLM_BACKEND_OPTIONS is a JSON object of backend options,
+# e.g. '{"latency": "lognormal", "latency_ms": 1500, "error_rate": 0.05}'
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'api.llm.GeminiBackend')
+LLM_BACKEND_OPTIONS = json.loads(os.environ.get('LLM_BACKEND_OPTIONS', '{}'))
+# 'async' runs the backend calls of a worker process on one event loop, at most
+# LLM_ASYNC_CONCURRENCY at a time (api/async_llm.py); start the worker with
+# --pool threads so it takes many tasks at once
+LLM_EXECUTION = os.environ.get('LLM_EXECUTION', 'sync')
+LLM_ASYNC_CONCURRENCY = int(os.environ.get('LLM_ASYNC_CONCURRENCY', 32))
+# Documents of a review are uploaded to the backend once and shared by question
+# generation, evaluation and re-evaluation (api/context_cache.py)
+LLM_CONTEXT_CACHE_ENABLED = True
+LLM_CONTEXT_CACHE_TTL = 6 * 60 * 60  # seconds
+LLM_CONTEXT_CACHE_WAIT = 30  # seconds to wait for another process creating the same context
+# Send the text extracted from documents (api/extraction.py) instead of the
+# files; pages with images and fewer characters than this are sent as PDF
+LLM_SEND_EXTRACTED_TEXT = True
+EXTRACTION_IMAGE_PAGE_MAX_CHARS = 200
+# Evaluations of reviews whose extracted documents exceed the budget send only
+# the pages most relevant to the proposed architecture and each answered
+# question (BM25, api/page_index.py)
+EVALUATION_PAGE_SELECTION = True
+EVALUATION_CONTEXT_TOKEN_BUDGET = 8000  # estimated tokens of document text
+EVALUATION_PAGES_PER_QUERY = 3
+# Prompt budgets in estimated tokens (api/prompt_budget.py), below the models'
+# context windows to leave room for the response. Requests over budget drop
+# their least relevant document pages; free-text fields longer than
+# LLM_FIELD_MAX_TOKENS are shortened first.
+LLM_TOKEN_BUDGETS = {
+    'gemini-2.0-flash-001': 900_000,
+}
+LLM_DEFAULT_TOKEN_BUDGET = 100_000
+LLM_FIELD_MAX_TOKENS = 1500
+# Requests and estimated prompt tokens per minute per model, shared by all
+# workers through token buckets in Redis (api/rate_limit.py); 0 is unlimited.
+# A task waits up to LLM_RATE_LIMIT_MAX_WAIT seconds for capacity, otherwise it
+# is re-queued for when the buckets will have refilled. A 429 pauses the model
+# for the delay the backend asks for, or LLM_RATE_LIMIT_BACKOFF seconds.
+LLM_RATE_LIMIT_ENABLED = True
+LLM_RATE_LIMIT_REDIS_URL = REDIS_URL
+LLM_RATE_LIMITS = {
+    'gemini-2.0-flash-001': {'rpm': 2000, 'tpm': 4_000_000},
+}
+LLM_DEFAULT_RATE_LIMIT = {'rpm': 0, 'tpm': 0}
+LLM_RATE_LIMIT_MAX_WAIT = 10  # seconds
+LLM_RATE_LIMIT_BACKOFF = 30  # seconds
+LLM_RATE_LIMIT_MAX_RETRIES = 20
+# Deadline per LLM call in seconds, by purpose. Calls past their deadline,
+# dropped connections and 408/5xx responses are retried by re-queuing the task
+# after a jittered exponential backoff: half to all of BASE * 2**retry seconds,
+# capped at LLM_RETRY_BACKOFF_MAX (api/retries.py)
+LLM_CALL_DEADLINES = {
+    'questions': 90,
+    'evaluation': 120,
+}
+LLM_DEFAULT_CALL_DEADLINE = 120
+LLM_RETRY_MAX_RETRIES = 4
+LLM_RETRY_BACKOFF_BASE = 2  # seconds
+LLM_RETRY_BACKOFF_MAX = 60  # seconds
+# Send a second, identical request for a call still unanswered after the
+# LLM_HEDGE_PERCENTILE latency of the worker's recent calls of that purpose,
+# and keep the first response; about (100 - percentile)% of calls are sent
+# twice. Needs LLM_HEDGE_MIN_SAMPLES timed calls first. Streamed question
+# generation is not hedged.
+LLM_HEDGE_ENABLED = False
+LLM_HEDGE_PERCENTILE = 95
+LLM_HEDGE_MIN_SAMPLES = 20
+# Save generated questions one by one while the response streams in
+LLM_STREAM_QUESTIONS = True
+# Parsed evaluation results are memoized by a hash of their inputs (api/memo.py)
+LLM_MEMO_MAXSIZE = 512  # entries kept per worker process
+LLM_MEMO_TTL = 24 * 60 * 60  # seconds
 
 # CORS Configuration - Allow all origins (for development)
 CORS_ALLOW_ALL_ORIGINS = True
@@ -174,3 +341,15 @@ CORS_ALLOW_METHODS = [
 
 # Allow credentials
 CORS_ALLOW_CREDENTIALS = True 
+
+# Logging: surface api.* INFO lines (Gemini call timings etc.) on the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}